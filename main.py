@@ -21,18 +21,30 @@ import time
 import sys
 import socket
 import select
+import selectors
+import errno
 import subprocess
 import traceback
 import logging
+import logging.handlers
+import queue
 from datetime import datetime
+from AppKit import NSImage
+from PyObjCTools import AppHelper
 
-# Helper function to determine if running as a bundled app
-def is_bundled_app():
-    return getattr(sys, 'frozen', False)
+# Use orjson to parse the config when available, it is faster than the json module
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Determine whether we are running as a bundled app, this never changes at runtime
+IS_BUNDLED = getattr(sys, 'frozen', False)
 
 # Get the appropriate base directory based on runtime environment
-def get_base_dir():
-    if is_bundled_app():
+def _compute_base_dir():
+    if IS_BUNDLED:
         # Running as bundled app
         executable_dir = os.path.dirname(os.path.abspath(sys.executable))
         if executable_dir.endswith('MacOS'):
@@ -44,169 +56,271 @@ def get_base_dir():
         # Running as script
         return os.path.dirname(os.path.realpath(__file__))
 
-# Get resource path for bundled app or development
-def get_resource_path(relative_path):
-    base_dir = get_base_dir()
+# Paths are computed once at import instead of on every lookup
+BASE_DIR = _compute_base_dir()
+# For bundled app resources are in the Resources folder, for development next to the script
+RESOURCES_DIR = os.path.join(BASE_DIR, 'Resources') if IS_BUNDLED else BASE_DIR
+CONFIG_PATH = os.path.join(RESOURCES_DIR, 'conf.json')
+ICON_DIR = os.path.join(RESOURCES_DIR, 'img')
+
+# Parsed configurations keyed by (path, mtime, size) so unchanged files are not re-read
+_CONFIG_CACHE = {}
+
+# Parse a port spec ("8080:udp", "8080udp", "8080") into (port, use_udp), or None if invalid
+def _parse_port_spec(port_spec, default_udp=False):
+    use_udp = default_udp
+    # Hand-edited configs may hold plain numbers, e.g. 8080 instead of "8080"
+    port_spec = str(port_spec)
     
-    if is_bundled_app():
-        # For bundled app, check in Resources folder
-        resources_dir = os.path.join(base_dir, 'Resources')
-        path = os.path.join(resources_dir, relative_path)
+    # Check first for the colon format (port:protocol)
+    if ":" in port_spec:
+        parts = port_spec.split(":")
+        port_num = parts[0]
+        protocol = parts[1].lower() if len(parts) > 1 else ""
+        
+        if protocol == "udp":
+            use_udp = True
+        elif protocol == "tcp":
+            use_udp = False
+    # Then check for the old format (portudp, porttcp)
+    elif "udp" in port_spec.lower():
+        port_num = port_spec.lower().replace("udp", "")
+        use_udp = True
+    elif "tcp" in port_spec.lower():
+        port_num = port_spec.lower().replace("tcp", "")
+        use_udp = False
     else:
-        # For development, use the direct path
-        path = os.path.join(base_dir, relative_path)
+        port_num = port_spec
     
-    # Debug output
-    print(f"Resolving resource path for: {relative_path}")
-    print(f"Path: {path}")
-    print(f"Path exists: {os.path.exists(path)}")
+    try:
+        return int(port_num), use_udp
+    except ValueError:
+        logging.error(f"Invalid port number: {port_num}")
+        return None
+
+# Parse a testing address ("host:port") into (host, port), or (None, None) if invalid
+def _parse_test_address(address_and_port):
+    parts = str(address_and_port).split(':') if address_and_port else ()
+    if len(parts) != 2:
+        return None, None
     
-    return path
+    try:
+        return parts[0], int(parts[1])
+    except ValueError:
+        logging.error(f"Invalid testing port: {address_and_port}")
+        return None, None
 
-# Setup logging
-base_dir = get_base_dir()
-if is_bundled_app():
+# Flag creating sockets directly in non-blocking mode, where the platform supports it
+_SOCK_NONBLOCK = getattr(socket, 'SOCK_NONBLOCK', 0)
+
+# Create a non-blocking socket without a separate setblocking call when possible
+def _nonblocking_socket(address_family, sock_type=socket.SOCK_STREAM):
+    s = socket.socket(address_family, sock_type | _SOCK_NONBLOCK)
+    if not _SOCK_NONBLOCK:
+        s.setblocking(False)
+    return s
+
+# Resolved addresses keyed by hostname: host -> (expires_at, address_family, sockaddr)
+_DNS_CACHE = {}
+_DNS_CACHE_TTL = 60  # Seconds
+
+# Resolve a hostname or IP to (address_family, sockaddr), reusing recent lookups.
+# The sockaddr comes straight from getaddrinfo with port 0, use _with_port to target a port.
+def _resolve(host):
+    # getaddrinfo(None) would resolve to localhost, a missing address must fail instead
+    if not host:
+        raise ValueError("no address configured")
+    
+    now = time.monotonic()
+    cached = _DNS_CACHE.get(host)
+    if cached is not None and cached[0] > now:
+        return cached[1], cached[2]
+    
+    address_family, _, _, _, sockaddr = socket.getaddrinfo(
+        host,
+        0,
+        type=socket.SOCK_STREAM,
+        flags=socket.AI_ADDRCONFIG | socket.AI_NUMERICSERV
+    )[0]
+    _DNS_CACHE[host] = (now + _DNS_CACHE_TTL, address_family, sockaddr)
+    return address_family, sockaddr
+
+# Return a resolved sockaddr with its port replaced, keeping the IPv6 flowinfo and scope id
+def _with_port(sockaddr, port):
+    return (sockaddr[0], port) + sockaddr[2:]
+
+# Setup logging, the log paths are computed once and reused by on_view_logs
+if IS_BUNDLED:
     # For bundled app, use the MacOS folder for logs
-    executable_dir = os.path.dirname(os.path.abspath(sys.executable))
-    log_dir = os.path.join(executable_dir, "log")
+    LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(sys.executable)), "log")
 else:
     # For development, use local log folder
-    log_dir = os.path.join(base_dir, "log")
+    LOG_DIR = os.path.join(BASE_DIR, "log")
+
+os.makedirs(LOG_DIR, exist_ok=True)
+LOG_FILE = os.path.join(LOG_DIR, f"knockthatdoor_{datetime.now().strftime('%Y%m%d')}.log")
+
+# Worker threads only put records on a queue, a background listener writes them to the file
+file_handler = logging.handlers.RotatingFileHandler(LOG_FILE, maxBytes=1_000_000, backupCount=3)
+file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(log_queue, file_handler)
+log_listener.start()
+root_logger = logging.getLogger()
+root_logger.setLevel(logging.INFO)
+root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+# Write out the queued log records and stop the listener, only the first call does anything
+_log_stop_lock = threading.Lock()
+_log_stopped = False
+
+def stop_logging():
+    global _log_stopped
+    with _log_stop_lock:
+        if not _log_stopped:
+            _log_stopped = True
+            log_listener.stop()
 
-os.makedirs(log_dir, exist_ok=True)
-log_file = os.path.join(log_dir, f"knockthatdoor_{datetime.now().strftime('%Y%m%d')}.log")
-logging.basicConfig(
-    filename=log_file,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Flush the queued records before the application terminates
+rumps.events.before_quit.register(stop_logging)
 
 class PortKnockerApp(rumps.App):
     def __init__(self):
-        self.script_dir = get_base_dir()
+        self.script_dir = BASE_DIR
         
         # Get paths for icons
-        if is_bundled_app():
-            # For bundled app
-            icon_path = get_resource_path('img/icona.png')
-            self.error_icon_path = get_resource_path('img/error.png')
-            self.connected_icon_path = get_resource_path('img/connected.png')
-            self.loading_icon_path = get_resource_path('img/loading1.png')
-            self.closed_icon_path = get_resource_path('img/closed.png')
-        else:
-            # For development
-            icon_path = os.path.join(self.script_dir, 'img', 'icona.png')
-            self.error_icon_path = os.path.join(self.script_dir, 'img', 'error.png')
-            self.connected_icon_path = os.path.join(self.script_dir, 'img', 'connected.png')
-            self.loading_icon_path = os.path.join(self.script_dir, 'img', 'loading1.png')
-            self.closed_icon_path = os.path.join(self.script_dir, 'img', 'closed.png')
+        # List the img folder once instead of probing each icon path
+        img_dir = ICON_DIR
+        try:
+            with os.scandir(img_dir) as it:
+                img_entries = {e.name: e.path for e in it}
+        except FileNotFoundError:
+            img_entries = {}
+        
+        # Missing icons are None
+        icon_path = img_entries.get('icona.png')
+        self.error_icon_path = img_entries.get('error.png')
+        self.connected_icon_path = img_entries.get('connected.png')
+        self.loading_icon_path = img_entries.get('loading1.png')
+        self.closed_icon_path = img_entries.get('closed.png')
+        
+        # Load each status icon once and reuse the NSImage on every status change
+        self._icon_images = {
+            'error': self.load_icon_image(self.error_icon_path),
+            'connected': self.load_icon_image(self.connected_icon_path),
+            'loading': self.load_icon_image(self.loading_icon_path),
+            'closed': self.load_icon_image(self.closed_icon_path),
+        }
+        # Failure icon indexed by from_check_connections: error after a knock, closed on a plain check
+        self._icons_fail = ('error', 'closed')
         
         logging.info(f"Starting KnockThatDoor from {self.script_dir}")
-        print(f"Starting KnockThatDoor from {self.script_dir}")
         
         # Initialize app with menu bar icon
-        if os.path.exists(icon_path):
+        if icon_path:
             logging.info(f"Using app icon: {icon_path}")
-            print(f"Using app icon: {icon_path}")
             super(PortKnockerApp, self).__init__("KnockThatDoor", icon=icon_path, quit_button=None)
         else:
-            logging.warning(f"WARNING: App icon not found: {icon_path}")
-            print(f"WARNING: App icon not found: {icon_path}")
+            logging.warning(f"WARNING: App icon not found in: {img_dir}")
             super(PortKnockerApp, self).__init__("KnockThatDoor", quit_button=None)
         
+        # Verify that icons exist
+        self.check_icons_exist(img_dir, img_entries)
+        
         self.config = self.load_config()
         self.setup_menu()
         
         # Flag to indicate when services have been verified
         self.services_verified = False
         
-        # Perform an initial check of all services when the app starts
+        # Perform an initial check of all services once the event loop is running,
+        # so the menu bar icon is shown before the checks start
+        self._initial_check_timer = rumps.Timer(self.on_initial_check_timer, 0.01)
+        self._initial_check_timer.start()
+    
+    def on_initial_check_timer(self, timer):
+        """Run the initial check from the first tick of the event loop, only once"""
+        timer.stop()
         self.initial_check()
     
     def load_config(self):
         try:
-            if is_bundled_app():
-                # For bundled app
-                config_path = get_resource_path('conf.json')
-            else:
-                # For development
-                config_path = os.path.join(self.script_dir, 'conf.json')
-            
-            logging.info(f"Loading config from: {config_path}")
-            print(f"Loading config from: {config_path}")
+            config_path = CONFIG_PATH
             
-            if not os.path.exists(config_path):
+            try:
+                st = os.stat(config_path)
+            except FileNotFoundError:
                 logging.warning(f"Config file not found: {config_path}")
-                print(f"Config file not found: {config_path}")
                 return {"services": []}
             
-            with open(config_path, 'r') as f:
-                config = json.load(f)
+            # Reuse the parsed config if the file has not changed since the last load
+            cache_key = (config_path, st.st_mtime_ns, st.st_size)
+            config = _CONFIG_CACHE.get(cache_key)
+            if config is not None:
+                logging.info(f"Config unchanged, using cached copy of: {config_path}")
+                return config
+            
+            logging.info(f"Loading config from: {config_path}")
+            
+            with open(config_path, 'rb') as f:
+                config = _json_loads(f.read())
+            
+            # Parse the knock sequences and testing addresses once so checks don't re-split them
+            for service in config.get("services", []):
+                # A malformed entry only disables its own service, not the whole config
+                try:
+                    knock_sequence = (_parse_port_spec(p) for p in service.get("ports_to_knock", []))
+                    service["_knock_sequence"] = [k for k in knock_sequence if k is not None]
+                except Exception as e:
+                    logging.error(f"Invalid ports_to_knock for service {service.get('service_name')}: {e}")
+                    service["_knock_sequence"] = []
+                service["_test_host"], service["_test_port"] = _parse_test_address(service.get("testing_address_and_port"))
+            
+            _CONFIG_CACHE.clear()
+            _CONFIG_CACHE[cache_key] = config
             return config
         except Exception as e:
             logging.error(f"Error loading config: {e}")
-            print(f"Error loading config: {e}")
             return {"services": []}
     
     def setup_menu(self):
         self.menu.clear()
         self.services_menu_items = {}
+        self.services_by_name = {}
         
-        # Verify that icons exist
-        self.check_icons_exist()
-        
-        # Add services from configuration file
+        # Build the service items from configuration file
         for service in self.config.get("services", []):
             service_name = service.get("service_name", "Unknown Service")
-            menu_item = rumps.MenuItem(service_name, callback=self.on_service_click)
-            self.menu.add(menu_item)
-            self.services_menu_items[service_name] = menu_item
-        
-        self.menu.add(None)
-        #check_button = rumps.MenuItem("Check Connections", callback=self.on_check_connections)
-        #self.menu.add(check_button)
-        self.menu.add(rumps.MenuItem("Refresh Config", callback=self.on_refresh_click))
-        self.menu.add(rumps.MenuItem("Edit Config", callback=self.on_edit_config))
-        self.menu.add(None)
-        self.menu.add(rumps.MenuItem("View Logs", callback=self.on_view_logs))
-        self.menu.add(rumps.MenuItem("Quit", callback=rumps.quit_application))
+            self.services_menu_items[service_name] = rumps.MenuItem(service_name, callback=self.on_service_click)
+            self.services_by_name[service_name] = service
+        
+        # Add all the items in a single update
+        self.menu.update(list(self.services_menu_items.values()) + [
+            None,
+            #rumps.MenuItem("Check Connections", callback=self.on_check_connections),
+            rumps.MenuItem("Refresh Config", callback=self.on_refresh_click),
+            rumps.MenuItem("Edit Config", callback=self.on_edit_config),
+            None,
+            rumps.MenuItem("View Logs", callback=self.on_view_logs),
+            rumps.MenuItem("Quit", callback=rumps.quit_application),
+        ])
     
-    def check_icons_exist(self):
-        """Verify that all icons exist and print a warning if missing"""
-        icons_to_check = [
-            self.error_icon_path,
-            self.connected_icon_path,
-            self.loading_icon_path,
-            self.closed_icon_path
-        ]
-        
-        for icon_path in icons_to_check:
-            if not os.path.exists(icon_path):
-                logging.warning(f"WARNING: Missing icon: {icon_path}")
-                print(f"WARNING: Missing icon: {icon_path}")
-            else:
-                logging.info(f"Icon found: {icon_path}")
-                print(f"Icon found: {icon_path}")
+    def check_icons_exist(self, img_dir, img_entries):
+        """Print a warning for every status icon missing from the img folder listing"""
+        for icon_name in ('error.png', 'connected.png', 'loading1.png', 'closed.png'):
+            if icon_name not in img_entries:
+                logging.warning(f"WARNING: Missing icon: {os.path.join(img_dir, icon_name)}")
     
     def on_edit_config(self, _):
         """Open the configuration file in TextEdit"""
         try:
-            if is_bundled_app():
-                # For bundled app
-                config_path = get_resource_path('conf.json')
-            else:
-                # For development
-                config_path = os.path.join(self.script_dir, 'conf.json')
-                
-            logging.info(f"Opening config file: {config_path}")
-            print(f"Opening config file: {config_path}")
+            logging.info(f"Opening config file: {CONFIG_PATH}")
             
             # Use the 'open' command to open the file with default editor
-            subprocess.run(["open", config_path], check=True)
+            subprocess.run(["open", CONFIG_PATH], check=True)
             
         except Exception as e:
             logging.error(f"Error opening config file: {e}")
-            print(f"Error opening config file: {e}")
             self.show_notification(
                 title="Error",
                 subtitle=f"Could not open config file: {e}"
@@ -215,26 +329,16 @@ class PortKnockerApp(rumps.App):
     def on_view_logs(self, _):
         """Open the log folder in Finder"""
         try:
-            if is_bundled_app():
-                # For bundled app, use the MacOS folder for logs
-                executable_dir = os.path.dirname(os.path.abspath(sys.executable))
-                log_dir = os.path.join(executable_dir, "log")
-            else:
-                # For development, use local log folder
-                log_dir = os.path.join(self.script_dir, "log")
-                
-            logging.info(f"Opening log directory: {log_dir}")
-            print(f"Opening log directory: {log_dir}")
+            logging.info(f"Opening log directory: {LOG_DIR}")
             
-            # Create the log directory if it doesn't exist yet
-            os.makedirs(log_dir, exist_ok=True)
+            # Create the log directory again in case it was removed while running
+            os.makedirs(LOG_DIR, exist_ok=True)
             
             # Use the 'open' command to open the folder in Finder
-            subprocess.run(["open", log_dir], check=True)
+            subprocess.run(["open", LOG_DIR], check=True)
             
         except Exception as e:
             logging.error(f"Error opening log directory: {e}")
-            print(f"Error opening log directory: {e}")
             self.show_notification(
                 title="Error",
                 subtitle=f"Could not open log directory: {e}"
@@ -243,11 +347,9 @@ class PortKnockerApp(rumps.App):
     def initial_check(self):
         """Perform an initial check of all services when the app starts"""
         logging.info("Performing initial check of all services")
-        print("Performing initial check of all services")
         
         # Don't show notifications for the initial check
-        for service in self.config.get("services", []):
-            threading.Thread(target=self.check_service, args=(service, True), daemon=True).start()
+        threading.Thread(target=self.check_all_services, args=(True,), daemon=True).start()
             
         # Set flag to True after initial verification
         self.services_verified = True
@@ -267,8 +369,8 @@ class PortKnockerApp(rumps.App):
         """Check the status of all connections"""
         # Set loading icons
         for service_name, menu_item in self.services_menu_items.items():
-            menu_item.icon = self.loading_icon_path
-            print(f"Set loading icon for {service_name}")
+            self.set_menu_item_icon(menu_item, 'loading')
+            logging.debug(f"Set loading icon for {service_name}")
         
         # Show notification informing the user checks are in progress
         self.show_info_notification(
@@ -276,274 +378,264 @@ class PortKnockerApp(rumps.App):
             "Checking connections... reopen menu to see results"
         )
         
-        # Start threads to check services with the 'from_check_connections' flag set to True
-        for service in self.config.get("services", []):
-            threading.Thread(target=self.check_service, args=(service, True), daemon=True).start()
+        # Check all services from a single thread with the 'from_check_connections' flag set to True
+        threading.Thread(target=self.check_all_services, args=(True,), daemon=True).start()
         
         # Set flag to true
         self.services_verified = True
     
-    # Metodo per verificare se una stringa è già un indirizzo IP
-    def is_ip_address(self, address):
-        """Check if a string is an IP address
-        
-        Args:
-            address: String to check
-            
-        Returns:
-            bool: True if address is an IP, False otherwise
-        """
-        try:
-            socket.inet_pton(socket.AF_INET, address)
-            return True
-        except socket.error:
-            try:
-                socket.inet_pton(socket.AF_INET6, address)
-                return True
-            except socket.error:
-                return False
-    
     # Metodo per risolvere gli indirizzi IP all'inizio e riutilizzarli
     def resolve_address(self, host):
-        """Resolve a hostname to an IP address
+        """Resolve a hostname to a socket address
         
         Args:
             host: Hostname or IP to resolve
             
         Returns:
-            tuple: (ip_address, address_family) or (None, None) if resolution fails
+            tuple: (sockaddr, address_family) or (None, None) if resolution fails.
+                   The sockaddr has port 0, see _with_port.
         """
         try:
-            # If already an IP address, don't do a lookup
-            if self.is_ip_address(host):
-                address_family = socket.AF_INET6 if ':' in host else socket.AF_INET
-                return host, address_family
-                
-            # Otherwise resolve the hostname
-            address_family, _, _, _, ip = socket.getaddrinfo(
-                host=host,
-                port=None,
-                flags=socket.AI_ADDRCONFIG
-            )[0]
-            return ip[0], address_family
+            # IP literals and hostnames both go through the cached getaddrinfo
+            address_family, sockaddr = _resolve(host)
+            return sockaddr, address_family
         except Exception as e:
             logging.error(f"Error resolving address {host}: {e}")
-            print(f"Error resolving address {host}: {e}")
             return None, None
     
-    def test_connection(self, hostname, port, timeout=0.2, resolved_ip=None):
+    def test_connection(self, hostname, port, timeout=0.2):
         """Test connection to a specified host and port using Python sockets
         
         Args:
             hostname: The hostname or IP to connect to
             port: The port number to connect to
             timeout: Timeout in seconds
-            resolved_ip: Optional pre-resolved IP address to avoid DNS lookups
             
         Returns:
             bool: True if connection successful, False otherwise
         """
         try:
-            # Use pre-resolved IP if provided
-            if resolved_ip:
-                ip_address = resolved_ip
-                # Determine address family based on the format of the IP
-                address_family = socket.AF_INET6 if ':' in ip_address else socket.AF_INET
-            else:
-                # Resolve the hostname to get the address family and IP
-                # This is slower but necessary if we don't have the IP yet
-                address_family, _, _, _, ip = socket.getaddrinfo(
-                    host=hostname,
-                    port=None,
-                    flags=socket.AI_ADDRCONFIG
-                )[0]
-                ip_address = ip[0]
+            # Resolve the hostname to get the address family and socket address (cached)
+            address_family, sockaddr = _resolve(hostname)
             
-            # Create a TCP socket
-            s = socket.socket(address_family, socket.SOCK_STREAM)
-            s.settimeout(timeout)
-            
-            # Try to connect
-            result = s.connect_ex((ip_address, int(port)))
-            s.close()
+            # Create a non-blocking TCP socket and start connecting
+            with _nonblocking_socket(address_family) as s:
+                result = s.connect_ex(_with_port(sockaddr, port))
+                
+                # Wait until the connection completes or the timeout expires
+                if result in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    _, writable, _ = select.select([], [s], [], timeout)
+                    if not writable:
+                        return False
+                    result = s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
             
             # If result is 0, connection succeeded
             return result == 0
         except Exception as e:
             logging.error(f"Error testing connection to {hostname}:{port} - {e}")
-            print(f"Error testing connection to {hostname}:{port} - {e}")
             return False
     
-    def perform_port_knock(self, host, ports, timeout=0.2, delay=0.2, default_udp=False, verbose=True, resolved_ip=None):
+    def perform_port_knock(self, host, knock_sequence, timeout=0.2, delay=0.2, verbose=True):
         """Perform port knocking on the specified host and ports
         
         Args:
             host: Hostname or IP to knock on
-            ports: List of ports to knock on, format: ["8006:tcp", "8080:udp", ...]
+            knock_sequence: List of (port, use_udp) tuples, as parsed by _parse_port_spec
             timeout: Timeout in seconds for each knock
             delay: Delay in seconds between knocks
-            default_udp: Whether to use UDP by default (if protocol not specified)
             verbose: Whether to print verbose information
-            resolved_ip: Optional pre-resolved IP address to avoid DNS lookups
             
         Returns:
             bool: True if all knocks were sent, False if an error occurred
         """
         try:
-            # Use pre-resolved IP if provided
-            if resolved_ip:
-                ip_address = resolved_ip
-                # Determine address family based on the format of the IP
-                address_family = socket.AF_INET6 if ':' in ip_address else socket.AF_INET
-            else:
-                # Resolve the hostname to get the address family and IP
-                address_family, _, _, _, ip = socket.getaddrinfo(
-                    host=host,
-                    port=None,
-                    flags=socket.AI_ADDRCONFIG
-                )[0]
-                ip_address = ip[0]
+            # Resolve the hostname to get the address family and socket address (cached)
+            address_family, sockaddr = _resolve(host)
+            ip_address = sockaddr[0]
             
             if verbose:
                 logging.info(f"Knocking on {host} ({ip_address})")
-                print(f"Knocking on {host} ({ip_address})")
             
-            # Process each port - optimized for speed
-            for i, port_spec in enumerate(ports):
-                # Parse port and protocol
-                use_udp = default_udp
-                
-                # Check first for the colon format (port:protocol)
-                if ":" in port_spec:
-                    parts = port_spec.split(":")
-                    port_num = parts[0]
-                    protocol = parts[1].lower() if len(parts) > 1 else ""
+            # UDP knocks share one unconnected datagram socket, created on the first UDP knock
+            udp_sock = None
+            
+            # Knock i is due at start + i * delay on the monotonic clock, so the time
+            # spent sending each knock doesn't accumulate over the sequence
+            start = time.monotonic()
+            
+            try:
+                # Process each pre-parsed (port, protocol) pair - optimized for speed
+                for i, (port_num, use_udp) in enumerate(knock_sequence):
+                    # Wait for the knock's slot (the first one is sent right away)
+                    if delay > 0 and i > 0:
+                        remaining = start + i * delay - time.monotonic()
+                        if remaining > 0:
+                            time.sleep(remaining)
                     
-                    if protocol == "udp":
-                        use_udp = True
-                    elif protocol == "tcp":
-                        use_udp = False
-                # Then check for the old format (portudp, porttcp)
-                elif "udp" in port_spec.lower():
-                    port_num = port_spec.lower().replace("udp", "")
-                    use_udp = True
-                elif "tcp" in port_spec.lower():
-                    port_num = port_spec.lower().replace("tcp", "")
-                    use_udp = False
-                else:
-                    port_num = port_spec
-                
-                try:
-                    port_num = int(port_num)
-                except ValueError:
-                    logging.error(f"Invalid port number: {port_num}")
-                    print(f"Invalid port number: {port_num}")
-                    continue
-                
-                if verbose:
-                    logging.info(f"Hitting {ip_address}:{port_num} via {'UDP' if use_udp else 'TCP'}")
-                    print(f"Hitting {ip_address}:{port_num} via {'UDP' if use_udp else 'TCP'}")
-                
-                # Create the appropriate socket - optimized for speed
-                s = socket.socket(address_family, socket.SOCK_DGRAM if use_udp else socket.SOCK_STREAM)
-                s.setblocking(False)
-                
-                try:
-                    socket_address = (ip_address, port_num)
+                    if verbose:
+                        logging.info(f"Hitting {ip_address}:{port_num} via {'UDP' if use_udp else 'TCP'}")
+                    
+                    # Reuse the UDP socket, TCP knocks need a fresh socket each
                     if use_udp:
-                        # For UDP, just send an empty datagram - faster
-                        s.sendto(b'', socket_address)
+                        if udp_sock is None:
+                            udp_sock = _nonblocking_socket(address_family, socket.SOCK_DGRAM)
+                        s = udp_sock
                     else:
-                        # For TCP, just initiate a connection but don't wait for it to complete
-                        # No need for select.select() - we don't care about the response for port knocking
-                        s.connect_ex(socket_address)
-                except Exception as e:
-                    if verbose:
-                        logging.error(f"  Error during knock: {e}")
-                        print(f"  Error during knock: {e}")
-                finally:
-                    s.close()
-                
-                # Add delay between knocks (except for the last one)
-                if delay > 0 and i < len(ports) - 1:
-                    time.sleep(delay)
+                        s = _nonblocking_socket(address_family)
+                    
+                    try:
+                        socket_address = _with_port(sockaddr, port_num)
+                        if use_udp:
+                            # For UDP, just send an empty datagram - faster
+                            s.sendto(b'', socket_address)
+                        else:
+                            # For TCP, just initiate a connection but don't wait for it to complete
+                            # No need for select.select() - we don't care about the response for port knocking
+                            s.connect_ex(socket_address)
+                    except Exception as e:
+                        if verbose:
+                            logging.error(f"  Error during knock: {e}")
+                    finally:
+                        if s is not udp_sock:
+                            s.close()
+            finally:
+                if udp_sock is not None:
+                    udp_sock.close()
             
             return True
         except Exception as e:
             logging.error(f"Error performing port knock: {e}")
-            print(f"Error performing port knock: {e}")
             return False
     
-    def check_service(self, service, from_check_connections=False):
-        """Check the status of a single service
+    def check_all_services(self, from_check_connections=False, timeout=0.5):
+        """Check the status of all services from a single thread
+        
+        All connections are started non-blocking and their completion is
+        multiplexed with a selector, so the whole check takes at most one timeout.
         
         Args:
-            service: The service configuration to check
             from_check_connections: If True, use closed.png for timeouts, if False use error.png
+            timeout: Timeout in seconds shared by all connection attempts
         """
-        service_name = service.get("service_name")
-        testing_address_and_port = service.get("testing_address_and_port")
-        
-        if not testing_address_and_port or service_name not in self.services_menu_items:
-            return
-            
-        menu_item = self.services_menu_items[service_name]
-        
+        selector = selectors.DefaultSelector()
         try:
-            parts = testing_address_and_port.split(':')
-            if len(parts) != 2:
-                return
-            
-            address, port = parts
-            
-            # Resolve IP address once
-            testing_ip, _ = self.resolve_address(address)
-            
-            # Test connection with Python sockets using resolved IP
-            logging.info(f"Testing {service_name}: socket connection to {address}:{port}")
-            print(f"Testing {service_name}: socket connection to {address}:{port}")
-            
-            # Use a 0.5-second timeout for the connection test (faster)
-            connection_successful = self.test_connection(
-                address, 
-                port, 
-                timeout=0.5,
-                resolved_ip=testing_ip  # Pass the resolved IP
-            )
-            
-            # Update icon based on result
-            if connection_successful:
-                logging.info(f"Service {service_name} is accessible")
-                print(f"Service {service_name} is accessible")
-                menu_item.icon = self.connected_icon_path
-                print(f"Set connected icon for {service_name}")
-            else:
-                logging.info(f"Service {service_name} is not accessible")
-                print(f"Service {service_name} is not accessible")
-                if from_check_connections:
-                    menu_item.icon = self.closed_icon_path
-                    print(f"Set closed icon for {service_name}")
+            for service in self.config.get("services", []):
+                service_name = service.get("service_name")
+                address = service.get("_test_host")
+                port = service.get("_test_port")
+                
+                if address is None or service_name not in self.services_menu_items:
+                    continue
+                
+                logging.info(f"Testing {service_name}: socket connection to {address}:{port}")
+                
+                s = None
+                try:
+                    # Resolve the socket address (cached)
+                    testing_addr, address_family = self.resolve_address(address)
+                    if testing_addr is None:
+                        self.report_service_status(service_name, False, from_check_connections)
+                        continue
+                    
+                    # Start a non-blocking connection
+                    s = _nonblocking_socket(address_family)
+                    result = s.connect_ex(_with_port(testing_addr, port))
+                except Exception as e:
+                    logging.error(f"Error checking status for {service_name}: {e}")
+                    if s is not None:
+                        s.close()
+                    self.set_service_icon(service_name, 'error')
+                    continue
+                
+                if result in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    selector.register(s, selectors.EVENT_WRITE, service_name)
                 else:
-                    menu_item.icon = self.error_icon_path
-                    print(f"Set error icon for {service_name}")
+                    # Connection completed (or failed) immediately
+                    s.close()
+                    self.report_service_status(service_name, result == 0, from_check_connections)
+            
+            # Wait for the pending connections until the shared deadline expires
+            deadline = time.monotonic() + timeout
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                for key, _ in selector.select(remaining):
+                    s = key.fileobj
+                    result = s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    selector.unregister(s)
+                    s.close()
+                    self.report_service_status(key.data, result == 0, from_check_connections)
+            
+            # Connections still pending have timed out
+            for key in list(selector.get_map().values()):
+                selector.unregister(key.fileobj)
+                key.fileobj.close()
+                self.report_service_status(key.data, False, from_check_connections)
+        finally:
+            selector.close()
+    
+    def report_service_status(self, service_name, connection_successful, from_check_connections=False):
+        """Log the result of a service check and update its icon
+        
+        Args:
+            service_name: Name of the checked service
+            connection_successful: Whether the test connection succeeded
+            from_check_connections: If True, use closed.png for timeouts, if False use error.png
+        """
+        if connection_successful:
+            logging.info(f"Service {service_name} is accessible")
+            icon_key = 'connected'
+        else:
+            logging.info(f"Service {service_name} is not accessible")
+            icon_key = self._icons_fail[from_check_connections]
+        
+        self.set_service_icon(service_name, icon_key)
+        logging.debug(f"Set {icon_key} icon for {service_name}")
+    
+    def set_service_icon(self, service_name, icon_key):
+        """Set the icon of a service menu item by service name"""
+        menu_item = self.services_menu_items.get(service_name)
+        if menu_item is not None:
+            self.set_menu_item_icon(menu_item, icon_key)
+    
+    def set_menu_item_icon(self, menu_item, icon_key):
+        """Set a cached status icon on a menu item from the main thread
+        
+        Args:
+            menu_item: The rumps.MenuItem to update
+            icon_key: One of 'error', 'connected', 'loading' or 'closed'
+        """
+        # Bypass rumps' path based icon setter, which decodes the file on every call
+        AppHelper.callAfter(menu_item._menuitem.setImage_, self._icon_images[icon_key])
+    
+    def load_icon_image(self, icon_path):
+        """Decode an icon file once into an NSImage sized like rumps menu item icons
+        
+        Args:
+            icon_path: Path to the image file, or None if the icon is missing
             
-        except Exception as e:
-            logging.error(f"Error checking status for {service_name}: {e}")
-            print(f"Error checking status for {service_name}: {e}")
-            menu_item.icon = self.error_icon_path
-            print(f"Set error icon for {service_name} error")
+        Returns:
+            NSImage or None if icon_path is None
+        """
+        if icon_path is None:
+            return None
+        image = NSImage.alloc().initWithContentsOfFile_(icon_path)
+        image.setScalesWhenResized_(True)
+        image.setSize_((20, 20))
+        return image
     
     def on_service_click(self, sender):
         """Handle click on a service"""
         service_name = sender.title
-        service = next((s for s in self.config.get("services", []) if s.get("service_name") == service_name), None)
+        service = self.services_by_name.get(service_name)
         
         if not service:
             return
         
         # Set loading icon
-        sender.icon = self.loading_icon_path
-        print(f"Set loading icon for {service_name}")
+        self.set_menu_item_icon(sender, 'loading')
+        logging.debug(f"Set loading icon for {service_name}")
         
         # Show notification that port knocking is in progress
         self.show_info_notification(
@@ -559,60 +651,48 @@ class PortKnockerApp(rumps.App):
         """First perform port knocking, then check the service connection"""
         service_name = service.get("service_name")
         target_address = service.get("target_address")
-        ports_to_knock = service.get("ports_to_knock", [])
-        testing_address_and_port = service.get("testing_address_and_port")
+        knock_sequence = service.get("_knock_sequence", [])
+        address = service.get("_test_host")
+        port = service.get("_test_port")
         
         # Get the delay in milliseconds from the service configuration
         delay_ms = service.get("delay_in_milliseconds", 300)  # Default to 300ms if not specified
+        
+        # Knocks are fired back-to-back when the knock daemon only cares about ordering
+        if not service.get("enforce_delay", True):
+            delay_ms = 0
         delay_sec = delay_ms / 1000.0  # Convert to seconds
         
         logging.info(f"\n\nProcessing service: {service_name} with delay: {delay_ms}ms")
-        print(f"\n\nProcessing service: {service_name} with delay: {delay_ms}ms")
         
-        # Resolve IP address once, then reuse it
-        target_ip, _ = self.resolve_address(target_address)
-        
-        # Perform port knocking using the socket implementation with resolved IP
+        # Perform port knocking using the socket implementation
+        # The address is resolved once and reused through the DNS cache
         knock_successful = self.perform_port_knock(
             host=target_address,
-            ports=ports_to_knock,
+            knock_sequence=knock_sequence,
             timeout=0.1,  # Only used for socket operations, not between knocks
             delay=delay_sec,  # This is the ONLY delay between knocks, from configuration
-            default_udp=False,
-            verbose=True,
-            resolved_ip=target_ip  # Pass the resolved IP
+            verbose=True
         )
         
         if not knock_successful:
             logging.error(f"Port knocking failed for {service_name}")
-            print(f"Port knocking failed for {service_name}")
             self.show_failure_notification(service_name)
-            menu_item.icon = self.error_icon_path
+            self.set_menu_item_icon(menu_item, 'error')
             return
         
         # Now check the connection
-        if testing_address_and_port:
+        if address is not None:
             try:
-                parts = testing_address_and_port.split(':')
-                if len(parts) != 2:
-                    return
-                
-                address, port = parts
-                
-                # Resolve testing IP address
-                testing_ip, _ = self.resolve_address(address)
-                
-                # Test connection using Python sockets with resolved IP
+                # Test connection using Python sockets, resolved once through the DNS cache
                 logging.info(f"Testing connection to {address}:{port}")
-                print(f"Testing connection to {address}:{port}")
                 
                 # Try connection with progressively increasing timeouts
                 for timeout in [0.5, 1.0, 2.0]:
                     connection_successful = self.test_connection(
                         address, 
                         port, 
-                        timeout=timeout,
-                        resolved_ip=testing_ip  # Pass the resolved IP
+                        timeout=timeout
                     )
                     if connection_successful:
                         break
@@ -620,34 +700,29 @@ class PortKnockerApp(rumps.App):
                 # Update icon based on result and show notification
                 if connection_successful:
                     logging.info(f"Service {service_name} is accessible")
-                    print(f"Service {service_name} is accessible")
                     self.show_success_notification(service_name)
-                    menu_item.icon = self.connected_icon_path
-                    print(f"Set connected icon for {service_name}")
+                    self.set_menu_item_icon(menu_item, 'connected')
+                    logging.debug(f"Set connected icon for {service_name}")
                 else:
                     logging.info(f"Service {service_name} is not accessible")
-                    print(f"Service {service_name} is not accessible")
                     self.show_failure_notification(service_name)
-                    menu_item.icon = self.error_icon_path
-                    print(f"Set error icon for {service_name}")
+                    self.set_menu_item_icon(menu_item, 'error')
+                    logging.debug(f"Set error icon for {service_name}")
                 
             except Exception as e:
                 logging.error(f"Error testing connection: {e}")
-                print(f"Error testing connection: {e}")
                 self.show_failure_notification(service_name)
-                menu_item.icon = self.error_icon_path
-                print(f"Set error icon for {service_name} error")
+                self.set_menu_item_icon(menu_item, 'error')
+                logging.debug(f"Set error icon for {service_name} error")
     
     def will_show_menu(self):
         """Method called before showing the menu"""
         logging.info("Menu is about to be displayed")
-        print("Menu is about to be displayed")
         return True
     
     def show_notification(self, title, subtitle, message=""):
         """Show a notification using rumps functionality"""
         logging.info(f"Showing notification: {title} - {subtitle}")
-        print(f"Showing notification: {title} - {subtitle}")
         
         # First, try the standard rumps notification
         try:
@@ -658,11 +733,9 @@ class PortKnockerApp(rumps.App):
                 message=message
             )
             logging.info("Sent notification using rumps.notification")
-            print("Sent notification using rumps.notification")
             return
         except Exception as e:
             logging.error(f"Error with rumps.notification: {e}")
-            print(f"Error with rumps.notification: {e}")
         
         # Alternative method 1: using alert
         try:
@@ -673,14 +746,11 @@ class PortKnockerApp(rumps.App):
                 message=subtitle
             )
             logging.info("Showed alert as fallback")
-            print("Showed alert as fallback")
             return
         except Exception as e:
             logging.error(f"Error with rumps.alert: {e}")
-            print(f"Error with rumps.alert: {e}")
         
         logging.error("All notification methods failed!")
-        print("All notification methods failed!")
     
     def show_success_notification(self, service_name):
         """Show a success notification"""
@@ -713,7 +783,6 @@ def run_app_with_restart():
     while restart_count < MAX_RESTARTS:
         try:
             logging.info(f"Starting app (restart count: {restart_count})")
-            print(f"Starting app (restart count: {restart_count})")
             
             # Create and run the app
             app = PortKnockerApp()
@@ -722,15 +791,12 @@ def run_app_with_restart():
             # If app.run() returns normally (e.g. through quit button),
             # we should exit without restarting
             logging.info("App exited normally")
-            print("App exited normally")
             break
             
         except Exception as e:
             restart_count += 1
             logging.error(f"App crashed with error: {e}")
             logging.error(f"Traceback: {traceback.format_exc()}")
-            print(f"App crashed with error: {e}")
-            print(f"Traceback: {traceback.format_exc()}")
             
             # Show a notification about the crash and restart if possible
             try:
@@ -743,16 +809,16 @@ def run_app_with_restart():
                 # If notification fails, just continue with restart
                 pass
             
-            logging.info(f"Waiting {restart_timeout} seconds before restart...")
-            print(f"Waiting {restart_timeout} seconds before restart...")
-            time.sleep(restart_timeout)
-            
-            # Increase timeout for subsequent restarts to avoid rapid restart cycles
-            restart_timeout = min(restart_timeout * 2, 30)  # Cap at 30 seconds
+            # No restart will follow the last allowed crash, so don't wait for it
+            if restart_count < MAX_RESTARTS:
+                logging.info(f"Waiting {restart_timeout} seconds before restart...")
+                time.sleep(restart_timeout)
+                
+                # Increase timeout for subsequent restarts to avoid rapid restart cycles
+                restart_timeout = min(restart_timeout * 2, 30)  # Cap at 30 seconds
     
     if restart_count >= MAX_RESTARTS:
         logging.critical(f"Reached maximum restart limit ({MAX_RESTARTS}). Exiting.")
-        print(f"Reached maximum restart limit ({MAX_RESTARTS}). Exiting.")
         # Try to show one final notification
         try:
             rumps.notification(
@@ -762,6 +828,9 @@ def run_app_with_restart():
             )
         except:
             pass
+    
+    # Flush the queued records on every way out, before_quit doesn't run after a crash
+    stop_logging()
 
 
 if __name__ == "__main__":
@@ -1,40 +1,102 @@
 from setuptools import setup
+import json
 import os
 
 APP = ['main.py']
 
-# Get all files in the img directory
-img_dir = 'img'
-img_files = []
-if os.path.exists(img_dir):
-    img_files = [os.path.join('img', f) for f in os.listdir(img_dir) if not f.startswith('.')]
+# Info.plist entries of the app bundle
+PLIST = {
+    'LSUIElement': True,  # Makes it a menubar app without dock icon
+    'CFBundleName': 'KnockThatDoor',
+    'CFBundleDisplayName': 'KnockThatDoor',
+    'CFBundleIdentifier': 'com.rempairamore.knockthatdoor',
+    'CFBundleVersion': '1.1.0',
+    'CFBundleShortVersionString': '1.1.0',
+    'NSHumanReadableCopyright': 'Copyleft rempairamore'
+}
+
+# Image types the app bundle needs (the Windows .ico is left out)
+IMG_EXTENSIONS = ('.png', '.icns', '.pdf', '.tiff')
+
+IMG_DIR = 'img'
+ICON_NAME = 'icona.icns'
+ICON_PATH = os.path.join(IMG_DIR, ICON_NAME)
+# Scan results of the img directory, reused while its mtime and the scan rules are unchanged
+SETUP_CACHE = os.path.join('build', '.setup_cache.json')
+# Bump when _scan_img_dir's skip rules change, so older cached scans are discarded
+SETUP_CACHE_VERSION = 1
 
-DATA_FILES = [
-    ('', ['conf.json']),  # Put conf.json in the Resources folder
-    ('img', img_files)    # Keep the img directory structure
-]
+# Get all files in the img directory in one pass, returning the bundled paths and all entry names
+def _scan_img_dir():
+    img_files, img_names = [], []
+    with os.scandir(IMG_DIR) as it:
+        for e in it:
+            # Skip hidden files and the Finder custom-icon sentinel
+            if e.name[:1] == '.' or e.name == 'Icon\r':
+                continue
+            img_names.append(e.name)
+            # is_file reuses the directory entry type instead of stat-ing each file
+            if e.is_file(follow_symlinks=False) and e.name.lower().endswith(IMG_EXTENSIONS):
+                img_files.append(e.path)
+    # scandir order depends on the filesystem, sort so builds get the same inputs everywhere
+    img_files.sort()
+    img_names.sort()
+    return img_files, img_names
+
+# Build the data files and the app icon path, rescanning img only when entries were added, removed or renamed
+def _build_data_files():
+    try:
+        dir_mtime = os.stat(IMG_DIR).st_mtime_ns
+    except FileNotFoundError:
+        img_files, img_names = [], []
+    else:
+        try:
+            with open(SETUP_CACHE) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        
+        # The file list also depends on the allowed extensions and the skip rules
+        cache_key = [SETUP_CACHE_VERSION, sorted(IMG_EXTENSIONS), dir_mtime]
+        if cache.get('key') == cache_key:
+            img_files, img_names = cache['files'], cache['names']
+        else:
+            img_files, img_names = _scan_img_dir()
+            os.makedirs(os.path.dirname(SETUP_CACHE), exist_ok=True)
+            with open(SETUP_CACHE, 'w') as f:
+                json.dump({'key': cache_key, 'files': img_files, 'names': img_names}, f)
+    
+    icon_file = ICON_PATH if ICON_NAME in img_names else None
+    
+    data_files = [
+        ('', ['conf.json']),  # Put conf.json in the Resources folder
+        ('img', img_files)    # Keep the img directory structure
+    ]
+    return data_files, icon_file
 
 OPTIONS = {
     'argv_emulation': False,  # Disable for better compatibility
-    'plist': {
-        'LSUIElement': True,  # Makes it a menubar app without dock icon
-        'CFBundleName': 'KnockThatDoor',
-        'CFBundleDisplayName': 'KnockThatDoor',
-        'CFBundleIdentifier': 'com.rempairamore.knockthatdoor',
-        'CFBundleVersion': '1.1.0',
-        'CFBundleShortVersionString': '1.1.0',
-        'NSHumanReadableCopyright': 'Copyleft rempairamore'
-    },
-    'packages': ['rumps'],
-    'iconfile': os.path.join(img_dir, 'icona.icns') if os.path.exists(os.path.join(img_dir, 'icona.icns')) else None,
-    'includes': ['rumps', 'socket', 'select', 'json', 'datetime', 'logging', 'threading'],
+    'plist': PLIST,
+    'includes': ['rumps'],
+    'optimize': 2,  # Strip asserts and docstrings from the bundled bytecode
+    'strip': True,  # Strip debug symbols from the bundled binaries
+    'no_chdir': True,  # main.py resolves its resources from absolute paths
+    'extension': '.app',  # Standard directory bundle, resources stay loose on disk
 }
 
-setup(
-    app=APP,
-    name='KnockThatDoor',
-    data_files=DATA_FILES,
-    options={'py2app': OPTIONS},
-    setup_requires=['py2app'],
-    license='GPL-3.0',
-)
\ No newline at end of file
+# Opt-in smaller build that uses the Python framework installed on the target Mac instead of bundling it
+if os.environ.get('KNOCKTHATDOOR_SEMI_STANDALONE') == '1':
+    OPTIONS['semi_standalone'] = True
+
+# img is only scanned when the script actually runs a build
+if __name__ == '__main__':
+    data_files, OPTIONS['iconfile'] = _build_data_files()
+    
+    setup(
+        app=APP,
+        name='KnockThatDoor',
+        data_files=data_files,
+        options={'py2app': OPTIONS},
+        setup_requires=['py2app'],
+        license='GPL-3.0',
+    )
@@ -14,20 +14,38 @@
 
 # Import necessary modules
 import json
+import functools
+import ipaddress
 import os
+import re
 import threading
 import time
 import sys
 import socket
+import struct
+import selectors
+import errno
 import subprocess
 import traceback
 import logging
+import logging.handlers
+import queue
+from dataclasses import dataclass
 from datetime import datetime
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageTk
 import pystray
 import tkinter as tk
 from tkinter import ttk, messagebox, font
 
+# Use orjson for faster config parsing when available
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # Try to import Windows-specific modules
 try:
     import winreg
@@ -36,40 +54,86 @@ except ImportError:
     WINDOWS_PLATFORM = False
 
 # Helper function to determine if running as a bundled app
+@functools.lru_cache(maxsize=1)
 def is_bundled_app():
     return getattr(sys, 'frozen', False)
 
 # Get the appropriate base directory based on runtime environment
+@functools.lru_cache(maxsize=1)
 def get_base_dir():
     if is_bundled_app():
         return os.path.dirname(sys.executable)
     else:
         return os.path.dirname(os.path.realpath(__file__))
 
+# The base directory doesn't change while running, compute it once at import
+_BASE_DIR = get_base_dir()
+
 # Get resource path for bundled app or development
+@functools.lru_cache(maxsize=None)
 def get_resource_path(relative_path):
-    base_dir = get_base_dir()
-    path = os.path.join(base_dir, relative_path)
-    print(f"Resolving resource path for: {relative_path}")
-    print(f"Path: {path}")
-    print(f"Path exists: {os.path.exists(path)}")
-    return path
+    return os.path.join(_BASE_DIR, relative_path)
+
+# Linger option closing a probe connection with a reset instead of leaving it in TIME_WAIT
+# (struct linger holds two u_shorts on Windows and two ints elsewhere)
+_LINGER_RESET = struct.pack('HH' if sys.platform == 'win32' else 'ii', 1, 0)
+
+# Port spec ("8080:udp", "8080/udp", "8080udp", "8080") as port number and optional protocol
+_PORT_RE = re.compile(r"^(\d+)[:/]?(tcp|udp)?$", re.I)
+
+# Parse a port spec into (port, use_udp), or None if invalid - no protocol means TCP
+def _parse_port_spec(port_spec):
+    # Hand-edited configs may hold plain numbers, e.g. 8080 instead of "8080"
+    m = _PORT_RE.match(str(port_spec).strip())
+    if not m:
+        logging.error(f"Invalid port spec: {port_spec}")
+        return None
+    return int(m.group(1)), (m.group(2) or "tcp").lower() == "udp"
+
+# Parse a testing address ("host:port" or "[v6]:port") into (host, port, family), or (None, None, None) if invalid
+def _parse_test_address(address_and_port):
+    if not address_and_port:
+        return None, None, None
+    try:
+        parts = urlsplit("//" + str(address_and_port).strip())
+        host, port = parts.hostname, parts.port
+    except ValueError:
+        host = port = None
+    if not host or port is None:
+        logging.error(f"Invalid testing address: {address_and_port}")
+        return None, None, None
+    # Only IPv6 literals contain ':', anything else is left to the resolver
+    return host, port, socket.AF_INET6 if ':' in host else socket.AF_UNSPEC
 
 # Setup logging
-base_dir = get_base_dir()
-log_dir = os.path.join(base_dir, "log")
+log_dir = os.path.join(_BASE_DIR, "log")
 os.makedirs(log_dir, exist_ok=True)
 log_file = os.path.join(log_dir, f"knockthatdoor_{datetime.now().strftime('%Y%m%d')}.log")
-logging.basicConfig(
-    filename=log_file,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+file_handler = logging.FileHandler(log_file)
+file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 
 # Add console logging as well
 console = logging.StreamHandler()
 console.setLevel(logging.INFO)
-logging.getLogger('').addHandler(console)
+
+# Worker and UI threads only put records on a queue, a background listener writes them out
+log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(log_queue, file_handler, console, respect_handler_level=True)
+log_listener.start()
+root_logger = logging.getLogger()
+root_logger.setLevel(logging.INFO)
+root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+# Write out the queued log records and stop the listener, only the first call does anything
+_log_stop_lock = threading.Lock()
+_log_stopped = False
+
+def stop_logging():
+    global _log_stopped
+    with _log_stop_lock:
+        if not _log_stopped:
+            _log_stopped = True
+            log_listener.stop()
 
 # Colors and styles
 COLORS = {
@@ -88,29 +152,14 @@ COLORS = {
     "close_button": "#ff5252"  # Close button hover color
 }
 
-# For rounded corners and other custom styles
-class RoundedButton(tk.Button):
-    def __init__(self, master=None, text="Button", command=None, bg=COLORS["button"], fg=COLORS["text"], 
-                 hover_bg=COLORS["button_hover"], font=None, corner_radius=15, width=None, **kwargs):
-        self.hover_bg = hover_bg
-        super().__init__(master, text=text, command=command, bg=bg, fg=fg, font=font, 
-                        relief=tk.FLAT, bd=0, padx=10, pady=5, width=width, **kwargs)
-        self.bind("<Enter>", self.on_enter)
-        self.bind("<Leave>", self.on_leave)
-    
-    def on_enter(self, e):
-        self.config(background=self.hover_bg)
-    
-    def on_leave(self, e):
-        self.config(background=COLORS["button"])
-
-# Try to import win10toast for nice Windows 10/11 notifications
-try:
-    from win10toast import ToastNotifier
-    toaster = ToastNotifier()
-    HAVE_TOAST = True
-except ImportError:
-    HAVE_TOAST = False
+# Create the win10toast notifier on first use, or None if win10toast isn't available
+@functools.lru_cache(maxsize=1)
+def _get_toaster():
+    try:
+        from win10toast import ToastNotifier
+    except ImportError:
+        return None
+    return ToastNotifier()
 
 # Show Windows notification (only used for critical errors now)
 def show_notification(title, message, duration=1):
@@ -120,7 +169,8 @@ def show_notification(title, message, duration=1):
         logging.info(f"Notification: {title} - {message}")
         
         # Try using win10toast
-        if HAVE_TOAST:
+        toaster = _get_toaster()
+        if toaster is not None:
             try:
                 toaster.show_toast(
                     title,
@@ -143,6 +193,13 @@ def show_notification(title, message, duration=1):
         logging.error(f"Error showing notification: {e}")
         return False
 
+@dataclass
+class ServiceView:
+    """What a service row currently shows, so unchanged values aren't pushed to Tk again"""
+    iid: str
+    state: str = "unknown"
+    knock_text: str = "Knock"
+
 class PopupWindow(tk.Toplevel):
     """A popup window for KnockThatDoor inspired by f.lux design"""
     def __init__(self, parent, app, close_callback):
@@ -166,11 +223,11 @@ class PopupWindow(tk.Toplevel):
         # Bind Escape key to close the window
         self.bind("<Escape>", self.on_close)
         
-        # Set up custom fonts
-        self.title_font = font.Font(family="Segoe UI", size=14, weight="bold")
-        self.header_font = font.Font(family="Segoe UI", size=11, weight="bold")
-        self.normal_font = font.Font(family="Segoe UI", size=10)
-        self.small_font = font.Font(family="Segoe UI", size=9)
+        # Use the fonts shared by all popups
+        self.title_font = app.fonts["title"]
+        self.header_font = app.fonts["header"]
+        self.normal_font = app.fonts["normal"]
+        self.small_font = app.fonts["small"]
         
         # Create UI elements
         self.create_widgets()
@@ -181,7 +238,7 @@ class PopupWindow(tk.Toplevel):
         # Add a better close button - centered at top right
         close_button = tk.Button(self, text="×", command=self.on_close, 
                                 bg=COLORS["bg"], fg=COLORS["text"], bd=0, 
-                                font=("Segoe UI", 20, "bold"), relief=tk.FLAT,
+                                font=app.fonts["close"], relief=tk.FLAT,
                                 width=2, height=1)
         close_button.place(x=315, y=0)
         
@@ -197,8 +254,8 @@ class PopupWindow(tk.Toplevel):
         # Lift the window to the top
         self.attributes('-topmost', True)
         
-        # Update window
-        self.update()
+        # Draw the window without dispatching the pending events
+        self.update_idletasks()
         
     def position_window(self):
         """Position the window in the bottom right corner of the screen"""
@@ -226,25 +283,12 @@ class PopupWindow(tk.Toplevel):
         header_frame = tk.Frame(main_frame, bg=COLORS["bg"])
         header_frame.pack(fill=tk.X, pady=(0, 15))
         
-        # Try to load and display app logo
-        logo_image = None
-        try:
-            logo_path = get_resource_path('img/icona.png')
-            if os.path.exists(logo_path):
-                logo = Image.open(logo_path)
-                logo = logo.resize((24, 24), Image.LANCZOS)
-                logo_image = ImageTk.PhotoImage(logo)
-                
-                logo_label = tk.Label(header_frame, image=logo_image, bg=COLORS["bg"])
-                logo_label.image = logo_image  # Keep a reference
-                logo_label.pack(side=tk.LEFT)
-            else:
-                # If logo not found, just leave space
-                spacer = tk.Label(header_frame, text="", width=3, bg=COLORS["bg"])
-                spacer.pack(side=tk.LEFT)
-        except Exception as e:
-            logging.error(f"Error loading logo: {e}")
-            # If error loading logo, just leave space
+        # Display the app logo, decoded and resized once by the app
+        if self.app.logo_photo:
+            logo_label = tk.Label(header_frame, image=self.app.logo_photo, bg=COLORS["bg"])
+            logo_label.pack(side=tk.LEFT)
+        else:
+            # If logo not found, just leave space
             spacer = tk.Label(header_frame, text="", width=3, bg=COLORS["bg"])
             spacer.pack(side=tk.LEFT)
         
@@ -266,20 +310,20 @@ class PopupWindow(tk.Toplevel):
         button_frame2.pack(fill=tk.X, pady=(2, 5))
         
         # Create buttons with the custom style - all with same width (12)
-        check_button = RoundedButton(button_frame1, text="Check All", command=self.app.check_all_services,
-                                  bg=COLORS["button"], fg=COLORS["text"], font=self.normal_font, width=12)
+        check_button = ttk.Button(button_frame1, text="Check All", command=self.app.check_all_services,
+                                  style="Knock.TButton", width=12)
         check_button.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.X, expand=True)
         
-        refresh_button = RoundedButton(button_frame1, text="Reload Config", command=self.app.refresh_config,
-                                    bg=COLORS["button"], fg=COLORS["text"], font=self.normal_font, width=12)
+        refresh_button = ttk.Button(button_frame1, text="Reload Config", command=self.app.refresh_config,
+                                  style="Knock.TButton", width=12)
         refresh_button.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.X, expand=True)
         
-        edit_button = RoundedButton(button_frame2, text="Edit Config", command=self.app.edit_config,
-                                 bg=COLORS["button"], fg=COLORS["text"], font=self.normal_font, width=12)
+        edit_button = ttk.Button(button_frame2, text="Edit Config", command=self.app.edit_config,
+                                  style="Knock.TButton", width=12)
         edit_button.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.X, expand=True)
         
-        logs_button = RoundedButton(button_frame2, text="View Logs", command=self.app.view_logs,
-                                 bg=COLORS["button"], fg=COLORS["text"], font=self.normal_font, width=12)
+        logs_button = ttk.Button(button_frame2, text="View Logs", command=self.app.view_logs,
+                                  style="Knock.TButton", width=12)
         logs_button.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.X, expand=True)
         
         # Services status area - con altezza fissa per garantire lo scrolling
@@ -292,111 +336,103 @@ class PopupWindow(tk.Toplevel):
                                 anchor="w")
         services_header.pack(anchor="w", pady=(0, 10))
 
-        # Create scrollable frame for services - IMPORTANTE: altezza fissa definita esplicitamente
+        # Services list: one Treeview row per service with name, status dot and knock action
         services_container = tk.Frame(status_frame, bg=COLORS["bg"])
         services_container.pack(fill=tk.BOTH, expand=True)
-        services_container.config(height=260)  # Altezza fissa per garantire spazio per lo scrolling
 
-        # Canvas for scrolling - anche qui altezza fissa
-        services_canvas = tk.Canvas(services_container, bg=COLORS["bg"], highlightthickness=0, height=260)
-        services_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.services_tree = ttk.Treeview(services_container, columns=("status", "knock"), show="tree",
+                                          style="Services.Treeview", selectmode="none", height=8)
+        self.services_tree.column("#0", stretch=True)
+        self.services_tree.column("status", width=30, anchor="center", stretch=False)
+        self.services_tree.column("knock", width=90, anchor="center", stretch=False)
+        self.services_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-        # Scrollbar styling
-        style = ttk.Style()
-        style.theme_use('clam')  # Use the 'clam' theme as a base
-        style.configure("Custom.Vertical.TScrollbar", 
-                       troughcolor=COLORS["bg"], 
-                       background=COLORS["button"], 
-                       arrowcolor=COLORS["text"])
+        # Row colors by service state
+        self.services_tree.tag_configure("unknown", foreground=COLORS["text_light"])
+        self.services_tree.tag_configure("ok", foreground=COLORS["success"])
+        self.services_tree.tag_configure("error", foreground=COLORS["error"])
+        self.services_tree.tag_configure("warning", foreground=COLORS["warning"])
 
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(services_container, orient=tk.VERTICAL, command=services_canvas.yview,
+        # Add scrollbar (styled once by the app)
+        scrollbar = ttk.Scrollbar(services_container, orient=tk.VERTICAL, command=self.services_tree.yview,
                                 style="Custom.Vertical.TScrollbar")
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.services_tree.configure(yscrollcommand=scrollbar.set)
 
-        # Configure canvas
-        services_canvas.configure(yscrollcommand=scrollbar.set)
-
-        # Create frame for services inside canvas
-        self.services_inner_frame = tk.Frame(services_canvas, bg=COLORS["bg"])
-        canvas_window = services_canvas.create_window((0, 0), window=self.services_inner_frame, anchor="nw", width=services_canvas.winfo_width())
-
-        # Crea service cards
-        self.service_cards = {}
-        self.service_status_indicators = {}
-        self.service_knock_buttons = {}
-
-        for i, service in enumerate(self.app.config.get("services", [])):
-            service_name = service.get("service_name", "Unknown Service")
-            
-            # Create a card-style container for each service
-            card = tk.Frame(self.services_inner_frame, bg=COLORS["card"], bd=1, relief=tk.SOLID,
-                        padx=10, pady=10)
-            card.pack(fill=tk.X, pady=5, padx=2)
-            
-            # Add service name
-            name_label = tk.Label(card, text=service_name, font=self.normal_font, 
-                                bg=COLORS["card"], fg=COLORS["text"], anchor="w")
-            name_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
-            
-            # Status indicator (colored circle)
-            status_indicator = tk.Label(card, text="●", font=("Segoe UI", 14), 
-                                    bg=COLORS["card"], fg=COLORS["text_light"])
-            status_indicator.pack(side=tk.RIGHT, padx=(5, 0))
-            
-            # Knock button
-            knock_button = RoundedButton(card, text="Knock", font=self.small_font,
-                                        command=lambda sn=service_name: self.app.knock_service(sn))
-            knock_button.pack(side=tk.RIGHT)
-            
-            # Store references
-            self.service_cards[service_name] = card
-            self.service_status_indicators[service_name] = status_indicator
-            self.service_knock_buttons[service_name] = knock_button
-
-        # Versione FISSA e MIGLIORATA per l'aggiornamento della regione di scrolling
-        def update_scroll_region(event=None):
-            # Configura la regione di scrolling per includere tutti i contenuti
-            services_canvas.configure(scrollregion=services_canvas.bbox("all"))
-            # Imposta la larghezza della finestra interna per adattarsi al canvas
-            services_canvas.itemconfig(canvas_window, width=services_canvas.winfo_width())
-            services_canvas.update()
-
-        # Aggiungi binding all'evento di configurazione per aggiornare la regione di scrolling
-        self.services_inner_frame.bind("<Configure>", update_scroll_region)
-
-        # Binding all'evento di configurazione del canvas per aggiornare la larghezza della finestra interna
-        services_canvas.bind("<Configure>", lambda e: services_canvas.itemconfig(canvas_window, width=e.width))
-
-        # Chiamata iniziale per configurare correttamente lo scrolling
-        self.services_inner_frame.update_idletasks()
-        update_scroll_region()
-
-        # Versione migliorata dell'handler della rotellina del mouse
-        def _on_mousewheel(event):
-            services_canvas.yview_scroll(int(-1 * (event.delta/120)), "units")
-
-        # Binding della rotellina del mouse - IMPORTANTE: binding diretto al canvas
-        services_canvas.bind_all("<MouseWheel>", _on_mousewheel)
+        # Clicking the knock column of a row knocks that service
+        self.services_tree.bind("<Button-1>", self.on_tree_click)
 
-        # Clean up dei binding
-        def _cleanup_bindings():
-            try:
-                services_canvas.unbind_all("<MouseWheel>")
-            except:
-                pass
-
-        self.bind("<Destroy>", lambda e: _cleanup_bindings())
+        # Shown state of each row by service name, and the service name of each row. Rows get
+        # Treeview-generated ids since a name can be anything, even "" which is the root item
+        self.service_views = {}
+        self.service_names_by_iid = {}
+        for service in self.app.config.get("services", []):
+            self.add_service_row(service.get("service_name", "Unknown Service"))
+    
+    def add_service_row(self, service_name):
+        """Add the row with name, status indicator and knock action for a service"""
+        if service_name not in self.service_views:
+            iid = self.services_tree.insert("", "end", text=service_name,
+                                            values=("●", "Knock"), tags=("unknown",))
+            self.service_views[service_name] = ServiceView(iid)
+            self.service_names_by_iid[iid] = service_name
+    
+    def on_tree_click(self, event):
+        """Knock the service whose knock column was clicked, unless it is already knocking"""
+        service_name = self.service_names_by_iid.get(self.services_tree.identify_row(event.y))
+        if service_name is not None and self.services_tree.identify_column(event.x) == "#2":
+            if self.service_views[service_name].knock_text == "Knock":
+                self.app.knock_service(service_name)
+    
+    def set_service_state(self, service_name, state, knock_text=None):
+        """Color a service row by state and optionally change its knock action text
+        
+        Args:
+            service_name: Name of the service to update
+            state: One of "unknown", "ok", "error" or "warning"
+            knock_text: New text of the knock column, or None to leave it unchanged
+        """
+        view = self.service_views.get(service_name)
+        if view is None:
+            return
+        if state != view.state:
+            view.state = state
+            self.services_tree.item(view.iid, tags=(state,))
+        if knock_text is not None and knock_text != view.knock_text:
+            view.knock_text = knock_text
+            self.services_tree.set(view.iid, "knock", knock_text)
+    
+    def rebuild_services(self, config):
+        """Bring the service rows in line with a reloaded configuration
+        
+        Only rows of removed or added services are deleted or created,
+        the rest of the window is kept as it is.
+        
+        Args:
+            config: The reloaded configuration
+        """
+        new_names = [s.get("service_name", "Unknown Service") for s in config.get("services", [])]
+        new_set = set(new_names)
+        
+        # Remove the rows of services that are gone
+        gone = [n for n in self.service_views if n not in new_set]
+        if gone:
+            views = [self.service_views.pop(service_name) for service_name in gone]
+            self.services_tree.delete(*(view.iid for view in views))
+            for view in views:
+                del self.service_names_by_iid[view.iid]
+        
+        # Add rows for the new services and follow the configuration order
+        for index, service_name in enumerate(new_names):
+            self.add_service_row(service_name)
+            self.services_tree.move(self.service_views[service_name].iid, "", index)
+        
+        self.update_service_status()
     
     def update_service_status(self):
         """Update the service status indicators in the UI"""
         for service_name, status in self.app.service_status.items():
-            if service_name in self.service_status_indicators:
-                indicator = self.service_status_indicators[service_name]
-                if status:  # Service is accessible
-                    indicator.config(fg=COLORS["success"])
-                else:  # Service is not accessible
-                    indicator.config(fg=COLORS["error"])
+            self.set_service_state(service_name, "ok" if status else "error")
     
     def on_close(self, event=None):
         """Handle window close event"""
@@ -406,8 +442,16 @@ class PopupWindow(tk.Toplevel):
 
 class KnockThatDoorApp:
     """The main application class that handles the system tray icon and core functionality"""
+    # Seconds a resolved address is reused, and a failed lookup is remembered
+    _dns_cache_ttl = 900
+    _dns_negative_ttl = 30
+    # Seconds a probe result is reused by service checks
+    _probe_cache_ttl = 10.0
+    # Timeout in seconds of each probe attempt inside the retry window after a knock
+    _probe_attempt_timeout = 0.2
+    
     def __init__(self):
-        self.script_dir = get_base_dir()
+        self.script_dir = _BASE_DIR
         
         # Get path for icons
         if is_bundled_app():
@@ -428,24 +472,88 @@ class KnockThatDoorApp:
         # Service status tracking
         self.service_status = {}
         
+        # Service UI updates waiting for the next idle flush
+        self._dirty = {}
+        self._dirty_lock = threading.Lock()
+        self._flush_pending = False
+        self._popup_visible = False
+        
+        # Stops the background service check and auto-knock loops of the current configuration
+        self._check_stop = None
+        
+        # Resolved addresses by (host, port) as ((family, proto, sockaddr) or None, expiry on the monotonic clock)
+        self._dns_cache = {}
+        self._dns_lock = threading.Lock()
+        
+        # Probe results by (host, port) as (accessible, expiry on the monotonic clock)
+        self._probe_cache = {}
+        self._probe_lock = threading.Lock()
+        
+        # Worker threads shared by service checks and knocks
+        self.pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="knock")
+        
         # Setup the root tkinter window (hidden)
         self.root = tk.Tk()
         self.root.withdraw()  # Hide the root window
         
-        # Set the window icon
-        if os.path.exists(self.icon_path):
-            icon = ImageTk.PhotoImage(Image.open(self.icon_path))
+        # Fonts and ttk styles are created once and shared by every popup
+        self.fonts = {
+            "title": font.Font(family="Segoe UI", size=14, weight="bold"),
+            "header": font.Font(family="Segoe UI", size=11, weight="bold"),
+            "normal": font.Font(family="Segoe UI", size=10),
+            "small": font.Font(family="Segoe UI", size=9),
+            "close": font.Font(family="Segoe UI", size=20, weight="bold"),
+        }
+        
+        # Scrollbar styling
+        style = ttk.Style()
+        style.theme_use('clam')  # Use the 'clam' theme as a base
+        style.configure("Custom.Vertical.TScrollbar", 
+                       troughcolor=COLORS["bg"], 
+                       background=COLORS["button"], 
+                       arrowcolor=COLORS["text"])
+        
+        # Flat buttons, the hover color is mapped by Tk itself instead of Enter/Leave callbacks
+        style.configure("Knock.TButton",
+                       background=COLORS["button"],
+                       foreground=COLORS["text"],
+                       font=self.fonts["normal"],
+                       relief=tk.FLAT,
+                       borderwidth=0,
+                       padding=(10, 5))
+        style.map("Knock.TButton", background=[("active", COLORS["button_hover"])])
+        
+        # Services list rows
+        style.configure("Services.Treeview",
+                       background=COLORS["card"],
+                       fieldbackground=COLORS["card"],
+                       foreground=COLORS["text"],
+                       font=self.fonts["normal"],
+                       rowheight=32,
+                       borderwidth=0)
+        
+        # Decode the icon once, the tray icon, window icon and popup logo all use this image
+        icon_loaded = self.load_icon()
+        
+        # Set the window icon and build the popup logo once, the app keeps the reference
+        self.logo_photo = None
+        if icon_loaded:
+            icon = ImageTk.PhotoImage(self.app_icon)
             self.root.iconphoto(True, icon)
+            try:
+                self.logo_photo = ImageTk.PhotoImage(self.app_icon.resize((24, 24), Image.LANCZOS))
+            except Exception as e:
+                logging.error(f"Error loading logo: {e}")
         
         # Initialize the popup window (but don't show it yet)
         self.popup = None
         
-        # Load icon for system tray
-        self.load_icon()
-        
         # Flag for clean shutdown
         self.is_shutting_down = False
         
+        # Thread running the system tray icon, started by run()
+        self._icon_thread = None
+        
         # Setup system tray icon
         self.setup_tray_icon()
         
@@ -481,8 +589,8 @@ class KnockThatDoorApp:
                     json.dump(default_config, f, indent=4)
                 return default_config
             
-            with open(config_path, 'r') as f:
-                config = json.load(f)
+            with open(config_path, 'rb') as f:
+                config = _json_loads(f.read())
             
             # Ensure the configurations section exists with default values
             if "configurations" not in config:
@@ -507,6 +615,18 @@ class KnockThatDoorApp:
                 with open(config_path, 'w') as f:
                     json.dump(config, f, indent=4)
             
+            # Parse the knock sequences and testing addresses once so knocking doesn't re-parse them
+            for service in config.get("services", []):
+                # A malformed entry only disables its own service, not the whole config
+                try:
+                    parsed_ports = (_parse_port_spec(p) for p in service.get("ports_to_knock", []))
+                    service["_parsed_ports"] = [p for p in parsed_ports if p is not None]
+                except Exception as e:
+                    logging.error(f"Invalid ports_to_knock for service {service.get('service_name')}: {e}")
+                    service["_parsed_ports"] = []
+                service["_test_host"], service["_test_port"], service["_test_family"] = _parse_test_address(
+                    service.get("testing_address_and_port"))
+            
             logging.info(f"Loaded config with {len(config.get('services', []))} services and configurations")
             return config
         except Exception as e:
@@ -564,9 +684,14 @@ class KnockThatDoorApp:
             # Make sure we're not missing any expected configurations
             self._ensure_all_configurations()
             
-            # Save the config
+            # Save the config without the values parsed at load time
+            config = dict(self.config)
+            config["services"] = [
+                {k: v for k, v in service.items() if not k.startswith('_')}
+                for service in self.config.get("services", [])
+            ]
             with open(config_path, 'w') as f:
-                json.dump(self.config, f, indent=4)
+                json.dump(config, f, indent=4)
                 
             logging.info(f"Saved config to {config_path}")
         except Exception as e:
@@ -595,11 +720,17 @@ class KnockThatDoorApp:
                 configurations[key] = default_value
     
     def load_icon(self):
-        """Load the application icon for system tray"""
+        """Load the application icon for system tray
+        
+        Returns:
+            bool: True if the icon was loaded from file, False if the default icon is used
+        """
         try:
             if os.path.exists(self.icon_path):
                 self.app_icon = Image.open(self.icon_path)
+                self.app_icon.load()
                 logging.info(f"Loaded icon from: {self.icon_path}")
+                return True
             else:
                 # Create a default icon if the icon file is not found
                 self.app_icon = Image.new('RGB', (64, 64), color=(73, 109, 137))
@@ -608,6 +739,7 @@ class KnockThatDoorApp:
             # Create a default icon if there's an error
             self.app_icon = Image.new('RGB', (64, 64), color=(73, 109, 137))
             logging.error(f"Error loading icon: {e}")
+        return False
     
     def setup_tray_icon(self):
         """Set up the system tray icon"""
@@ -668,22 +800,35 @@ class KnockThatDoorApp:
             self.popup.position_window()
             self.popup.lift()
             self.popup.update_service_status()
+        self._set_popup_visible(True)
     
     def toggle_popup(self):
         """Show or hide the popup window"""
         if self.popup is None or not self.popup.winfo_exists():
             self.popup = PopupWindow(self.root, self, self.popup_closed)
+            self._set_popup_visible(True)
         else:
             if self.popup.winfo_viewable():
                 self.popup.withdraw()
+                self._set_popup_visible(False)
             else:
                 self.popup.deiconify()
                 self.popup.position_window()
                 self.popup.lift()
                 self.popup.update_service_status()
+                self._set_popup_visible(True)
+    
+    def _set_popup_visible(self, visible):
+        """Track whether the popup is shown, applying the UI updates queued while it was hidden"""
+        with self._dirty_lock:
+            self._popup_visible = visible
+        if visible:
+            self._flush_status()
     
     def popup_closed(self):
         """Callback when popup is closed"""
+        self._set_popup_visible(False)
+        
         # Check if minimize_to_tray is enabled
         minimize_to_tray = self.config.get("configurations", {}).get("minimize_to_tray", True)
         
@@ -703,8 +848,8 @@ class KnockThatDoorApp:
             self.add_to_startup()
         
         # Start the system tray icon in a separate thread
-        icon_thread = threading.Thread(target=self.icon.run, daemon=True)
-        icon_thread.start()
+        self._icon_thread = threading.Thread(target=self.icon.run, daemon=True)
+        self._icon_thread.start()
         
         # Check if we should show the window based on configuration and startup mode
         should_show_window = False
@@ -799,67 +944,63 @@ class KnockThatDoorApp:
     
     def exit_app(self, icon=None, item=None):
         """Exit the application properly"""
+        # The tray menu calls this from the icon thread, tear down from the Tk thread instead
+        if threading.current_thread() is not threading.main_thread():
+            self.root.after(0, self.exit_app)
+            return
+        
         logging.info("Exiting application")
         
-        # Set shutdown flag
+        # Set shutdown flag and stop the background service checks and auto-knocks
         self.is_shutting_down = True
+        if self._check_stop is not None:
+            self._check_stop.set()
         
-        # First, stop the icon if it exists
-        # We need to schedule this to run after the current event has processed
-        def stop_icon():
-            if hasattr(self, 'icon'):
-                try:
-                    # Stop the icon safely
-                    self.icon.stop()
-                except Exception as e:
-                    logging.error(f"Error stopping icon: {e}")
-        
-        # Use after to schedule the icon stopping
-        self.root.after(100, stop_icon)
+        # First, stop the icon and wait for its thread to finish
+        if hasattr(self, 'icon'):
+            try:
+                self.icon.stop()
+            except Exception as e:
+                logging.error(f"Error stopping icon: {e}")
+        if self._icon_thread is not None:
+            self._icon_thread.join(timeout=1.0)
         
         # Close any open popups
         if self.popup and self.popup.winfo_exists():
             self.popup.destroy()
         
-        # Schedule the app to quit after icon is stopped
-        def quit_app():
-            try:
-                # Destroy the root window and exit mainloop
-                self.root.quit()
-                self.root.destroy()
-            except Exception as e:
-                logging.error(f"Error during application exit: {e}")
+        try:
+            # Don't wait for running knocks, and drop the queued ones
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            
+            # Destroy the root window and exit mainloop
+            self.root.quit()
+            self.root.destroy()
+        except Exception as e:
+            logging.error(f"Error during application exit: {e}")
         
-        # Schedule quit to happen after icon is stopped
-        self.root.after(200, quit_app)
+        # Flush the queued log records
+        stop_logging()
     
     def check_all_services(self, icon=None, item=None):
         """Check the status of all services"""
         logging.info("Checking all services")
         
         # Set all service indicators to yellow (warning) while checking
-        if self.popup and self.popup.winfo_exists():
-            for indicator in self.popup.service_status_indicators.values():
-                indicator.config(fg=COLORS["warning"])
-            self.popup.update()
-        
-        # Check each service in a separate thread
         for service in self.config.get("services", []):
-            threading.Thread(target=self.check_service, args=(service,), daemon=True).start()
+            self.mark_dirty(service.get("service_name", "Unknown Service"), "warning")
         
-        # Update popup after a delay to allow checks to complete
-        if self.popup and self.popup.winfo_exists():
-            self.root.after(2000, self.popup.update_service_status)
+        # Check all services from one worker thread
+        self.pool.submit(self._check_batch)
     
     def refresh_config(self, icon=None, item=None):
         """Reload the configuration file"""
         logging.info("Refreshing configuration")
         self.config = self.load_config()
         
-        # Recreate the popup if it exists
+        # Update the service cards of the popup if it exists
         if self.popup and self.popup.winfo_exists():
-            self.popup.destroy()
-            self.popup = PopupWindow(self.root, self, self.popup_closed)
+            self.popup.rebuild_services(self.config)
         
         # Check service status
         self.check_all_services()
@@ -898,135 +1039,109 @@ class KnockThatDoorApp:
     
     def knock_service(self, service_name):
         """Perform port knocking on the specified service"""
-        logging.info(f"Knocking service: {service_name}")
+        logging.info("Knocking service: %s", service_name)
         
         # Find the service in the config
         service = next((s for s in self.config.get("services", []) if s.get("service_name") == service_name), None)
         
         if not service:
-            logging.error(f"Service {service_name} not found in configuration")
+            logging.error("Service %s not found in configuration", service_name)
             return
         
         # Update the UI
-        if self.popup and self.popup.winfo_exists():
-            if service_name in self.popup.service_status_indicators:
-                self.popup.service_status_indicators[service_name].config(fg=COLORS["warning"])
-                self.popup.service_knock_buttons[service_name].config(text="Knocking...", state=tk.DISABLED)
-                self.popup.update()
+        self.mark_dirty(service_name, "warning", "Knocking...")
         
-        # Start the knock in a separate thread
-        threading.Thread(target=self.perform_knock, args=(service,), daemon=True).start()
+        # Start the knock in a worker thread
+        self.pool.submit(self.perform_knock, service)
     
     def perform_knock(self, service):
         """Perform the actual port knocking and status check"""
         service_name = service.get("service_name", "Unknown Service")
         target_address = service.get("target_address")
         ports_to_knock = service.get("ports_to_knock", [])
-        testing_address_and_port = service.get("testing_address_and_port")
+        parsed_ports = service.get("_parsed_ports", [])
+        test_host = service.get("_test_host")
         
         # Get the delay in milliseconds from the service configuration
         delay_ms = service.get("delay_in_milliseconds", 300)  # Default to 300ms if not specified
         delay_sec = delay_ms / 1000.0  # Convert to seconds
         
-        logging.info(f"Performing knock for service: {service_name}")
-        logging.info(f"Target: {target_address}, Ports: {ports_to_knock}, Delay: {delay_ms}ms")
+        logging.info("Performing knock for service: %s", service_name)
+        logging.info("Target: %s, Ports: %s, Delay: %sms", target_address, ports_to_knock, delay_ms)
         
         # Update the UI to show knocking in progress
-        if self.popup and self.popup.winfo_exists():
-            if service_name in self.popup.service_status_indicators:
-                self.popup.service_status_indicators[service_name].config(fg=COLORS["warning"])
-                self.popup.service_knock_buttons[service_name].config(text="Knocking...", state=tk.DISABLED)
-                self.popup.update()
-        
-        # Resolve target address
-        target_ip = self.resolve_address(target_address)
-        if not target_ip:
-            logging.error(f"Could not resolve target address: {target_address}")
+        self.mark_dirty(service_name, "warning", "Knocking...")
+        
+        # Resolve target address, the address family only depends on the resolved target
+        target_info = self._resolve_cached(target_address, 0)
+        if not target_info:
+            logging.error("Could not resolve target address: %s", target_address)
             self.update_service_ui(service_name, False, "Knock")
             return
+        address_family, _, target_sockaddr = target_info[0]
+        target_ip = target_sockaddr[0]
+        
+        # Build every knock's socket address up front, keeping the IPv6 flow info and scope of the target
+        knocks = [((target_ip, port_num) + target_sockaddr[2:], port_num, use_udp)
+                  for port_num, use_udp in parsed_ports]
         
         # Perform the port knocking
         knock_successful = True  # Assume success unless error occurs
         
-        for i, port_spec in enumerate(ports_to_knock):
-            # Parse port and protocol
-            use_udp = False  # Default to TCP
-            port_num = None
-            
-            # Handle format with colon: port:protocol
-            if ":" in port_spec:
-                parts = port_spec.split(":")
-                port_num = parts[0]
-                protocol = parts[1].lower() if len(parts) > 1 else "tcp"
-                use_udp = (protocol == "udp")
-            # Handle format with protocol suffix: portudp or porttcp
-            elif "udp" in port_spec.lower():
-                port_num = port_spec.lower().replace("udp", "")
-                use_udp = True
-            elif "tcp" in port_spec.lower():
-                port_num = port_spec.lower().replace("tcp", "")
-                use_udp = False
-            else:
-                # Just a port number - default to TCP
-                port_num = port_spec
-                use_udp = False
-            
-            try:
-                port_num = int(port_num)
-            except ValueError:
-                logging.error(f"Invalid port number: {port_num} from spec {port_spec}")
-                continue
-            
-            # Log the knock
-            logging.info(f"Knocking {target_ip}:{port_num} via {'UDP' if use_udp else 'TCP'}")
-            
-            # Send the knock
-            try:
-                # Create appropriate socket
-                address_family = socket.AF_INET6 if ':' in target_ip else socket.AF_INET
-                s = socket.socket(address_family, socket.SOCK_DGRAM if use_udp else socket.SOCK_STREAM)
-                s.setblocking(False)
+        # UDP knocks share one unconnected datagram socket, created on the first UDP knock
+        udp_sock = None
+        
+        # Knock i is due at start + i * delay_sec, so the time spent sending doesn't add up
+        start = time.monotonic()
+        
+        try:
+            for i, (sockaddr, port_num, use_udp) in enumerate(knocks):
+                # Wait for the knock's slot (essential for proper port knocking)
+                remaining = start + i * delay_sec - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
+                
+                # Log the knock
+                logging.info("Knocking %s:%d via %s", target_ip, port_num, "UDP" if use_udp else "TCP")
                 
+                # Send the knock
                 try:
                     if use_udp:
-                        # For UDP, send empty datagram
-                        s.sendto(b'', (target_ip, port_num))
+                        # For UDP, send an empty datagram from the shared socket
+                        if udp_sock is None:
+                            udp_sock = socket.socket(address_family, socket.SOCK_DGRAM)
+                            udp_sock.setblocking(False)
+                        try:
+                            udp_sock.sendto(b'', sockaddr)
+                        except Exception as e:
+                            logging.error("Error during knock: %s", e)
                     else:
-                        # For TCP, initiate connection
-                        s.connect_ex((target_ip, port_num))
-                except Exception as e:
-                    logging.error(f"Error during knock: {e}")
-                    # Continue with next knock even if this one fails
-                finally:
-                    s.close()
-                
-                # Add delay between knocks (essential for proper port knocking)
-                if i < len(ports_to_knock) - 1:
-                    time.sleep(delay_sec)
+                        # For TCP, the non-blocking connect sends the SYN. The socket is closed right
+                        # away so a dropped SYN isn't resent later, out of order with the next knocks
+                        with socket.socket(address_family, socket.SOCK_STREAM) as s:
+                            s.setblocking(False)
+                            try:
+                                s.connect_ex(sockaddr)
+                            except Exception as e:
+                                logging.error("Error during knock: %s", e)
+                                # Continue with next knock even if this one fails
                     
-            except Exception as e:
-                logging.error(f"Error knocking port {port_num}: {e}")
-                knock_successful = False
-        
-        # Allow some time for firewall to process the knocks
-        time.sleep(0.5)
-        
-        # Check if the service is now accessible
+                except Exception as e:
+                    logging.error("Error knocking port %d: %s", port_num, e)
+                    knock_successful = False
+        finally:
+            if udp_sock is not None:
+                udp_sock.close()
+        
+        # Check if the service is now accessible, giving the firewall half a second
+        # to process the knocks without waiting for it when it's faster
         accessible = False
-        if testing_address_and_port:
+        if test_host:
             try:
-                host, port = testing_address_and_port.split(':')
-                
-                # Try with progressively increasing timeouts - this is important!
-                for timeout in [0.5, 1.0, 2.0, 5.0]:  # Added a longer 5-second timeout
-                    logging.info(f"Testing connection to {host}:{port} with timeout {timeout}s")
-                    if self.test_connection(host, int(port), timeout):
-                        accessible = True
-                        break
-                    # Add a small delay between connection attempts
-                    time.sleep(0.2)
+                accessible = self.test_connection_once(test_host, service["_test_port"], service["_test_family"],
+                                                       total_timeout=5.5, retry_window=0.5)
             except Exception as e:
-                logging.error(f"Error testing connection: {e}")
+                logging.error("Error testing connection: %s", e)
         
         # Update service status
         self.service_status[service_name] = accessible
@@ -1035,121 +1150,276 @@ class KnockThatDoorApp:
         self.update_service_ui(service_name, accessible, "Knock")
     
     def update_service_ui(self, service_name, status, button_text):
-        """Update the UI elements for a service"""
-        if self.popup and self.popup.winfo_exists():
-            # Use after() to schedule UI updates on the main thread
-            self.root.after(0, lambda: self._update_service_ui_internal(service_name, status, button_text))
+        """Show the result of a check or knock and re-enable the knock button"""
+        self.mark_dirty(service_name, "ok" if status else "error", button_text)
+    
+    def mark_dirty(self, service_name, state, button_text=None):
+        """Queue a UI update for a service, applied with the others at the next idle time
+        
+        Safe to call from worker threads, only the latest update per service is kept.
+        While the popup is hidden updates are only queued, so Tk isn't woken up.
+        
+        Args:
+            service_name: Name of the service to update
+            state: New state of the service row ("ok", "error" or "warning")
+            button_text: New text of the knock action, or None to leave it unchanged
+        """
+        with self._dirty_lock:
+            self._dirty[service_name] = (state, button_text)
+            schedule = self._popup_visible and not self._flush_pending
+            if schedule:
+                self._flush_pending = True
+        
+        if schedule:
+            self.root.after_idle(self._flush_status)
+    
+    def _flush_status(self):
+        """Apply all queued UI updates in one pass (runs on the main thread)"""
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, {}
+            self._flush_pending = False
+        
+        if not (self.popup and self.popup.winfo_exists()):
+            return
+        
+        for service_name, (state, button_text) in dirty.items():
+            self.popup.set_service_state(service_name, state, button_text)
     
-    def _update_service_ui_internal(self, service_name, status, button_text):
-        """Internal method to update UI elements (must be called on main thread)"""
-        if service_name in self.popup.service_status_indicators:
-            indicator = self.popup.service_status_indicators[service_name]
-            button = self.popup.service_knock_buttons[service_name]
+    def _check_batch(self, timeout=2.0):
+        """Check if all services are accessible without knocking
+        
+        All connections are started non-blocking and their completion is
+        multiplexed with a selector, so the whole batch takes at most one timeout.
+        Services sharing a testing address share one probe, and a result
+        probed in the last few seconds is reused.
+        
+        Args:
+            timeout: Timeout in seconds shared by all connection attempts
+        """
+        selector = selectors.DefaultSelector()
+        # Names of the services waiting on each pending probe, by (host, port)
+        pending = {}
+        try:
+            for service in self.config.get("services", []):
+                service_name = service.get("service_name", "Unknown Service")
+                test_host = service.get("_test_host")
+                
+                logging.info("Checking service: %s", service_name)
+                
+                if not test_host:
+                    self._record_check(service_name, False)
+                    continue
+                
+                # Reuse a fresh probe result, or join a probe already in flight
+                probe_key = (test_host, service["_test_port"])
+                with self._probe_lock:
+                    cached = self._probe_cache.get(probe_key)
+                if cached is not None and cached[1] > time.monotonic():
+                    self._record_check(service_name, cached[0])
+                    continue
+                if probe_key in pending:
+                    pending[probe_key].append(service_name)
+                    continue
+                
+                s = None
+                try:
+                    info = self._resolve_cached(test_host, service["_test_port"], service["_test_family"])
+                    if not info:
+                        self._record_check(service_name, False)
+                        continue
+                    
+                    # Start a non-blocking connection to the first address, the batch has no time for fallbacks
+                    family, proto, sockaddr = info[0]
+                    s = socket.socket(family, socket.SOCK_STREAM, proto)
+                    s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RESET)
+                    s.setblocking(False)
+                    result = s.connect_ex(sockaddr)
+                except Exception as e:
+                    logging.error("Error checking service %s: %s", service_name, e)
+                    if s is not None:
+                        s.close()
+                    self._record_check(service_name, False)
+                    continue
+                
+                if result in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    selector.register(s, selectors.EVENT_WRITE, probe_key)
+                    pending[probe_key] = [service_name]
+                else:
+                    # Connection completed (or failed) immediately
+                    s.close()
+                    self._record_probe(probe_key, [service_name], result == 0)
             
-            # Update status indicator
-            indicator.config(fg=COLORS["success"] if status else COLORS["error"])
+            # Wait for the pending connections until the shared deadline expires
+            deadline = time.monotonic() + timeout
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                for key, _ in selector.select(remaining):
+                    s = key.fileobj
+                    selector.unregister(s)
+                    result = s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    s.close()
+                    self._record_probe(key.data, pending.pop(key.data), result == 0)
             
-            # Re-enable button
-            button.config(text=button_text, state=tk.NORMAL)
+            # Whatever is still pending has timed out
+            for key in list(selector.get_map().values()):
+                selector.unregister(key.fileobj)
+                key.fileobj.close()
+                self._record_probe(key.data, pending.pop(key.data), False)
+        except Exception as e:
+            logging.error("Error checking services: %s", e)
+        finally:
+            selector.close()
     
-    def check_service(self, service):
-        """Check if a service is accessible without knocking"""
-        service_name = service.get("service_name", "Unknown Service")
-        testing_address_and_port = service.get("testing_address_and_port")
+    def _record_probe(self, probe_key, service_names, accessible):
+        """Cache the result of a probe and record it for every service that waited on it"""
+        with self._probe_lock:
+            self._probe_cache[probe_key] = (accessible, time.monotonic() + self._probe_cache_ttl)
+        for service_name in service_names:
+            self._record_check(service_name, accessible)
+    
+    def _record_check(self, service_name, accessible):
+        """Store the result of a service check and update the UI"""
+        self.service_status[service_name] = accessible
+        self.update_service_ui(service_name, accessible, "Knock")
+        logging.info("Service %s is %s", service_name, "accessible" if accessible else "not accessible")
+    
+    def _resolve_cached(self, host, port, family=socket.AF_UNSPEC):
+        """Resolve host:port to the address info needed to open a connection
         
-        logging.info(f"Checking service: {service_name}")
+        IP literals are converted directly and cached without expiry, hostnames
+        go through getaddrinfo and all their addresses are cached per (host, port)
+        with a TTL, including recent failures.
         
-        # Update UI to show checking in progress
-        if self.popup and self.popup.winfo_exists():
-            if service_name in self.popup.service_status_indicators:
-                self.popup.service_status_indicators[service_name].config(fg=COLORS["warning"])
-                self.popup.update()
+        Args:
+            host: Hostname or IP address to resolve
+            port: Port the socket address is built for
+            family: Address family to resolve for, AF_UNSPEC for any
+            
+        Returns:
+            List of (family, proto, sockaddr) tuples in getaddrinfo order, or None
+            if resolution failed
+        """
+        # getaddrinfo(None) would resolve to localhost, a missing address must fail instead
+        if not host:
+            return None
         
-        # Check connection
-        accessible = False
-        if testing_address_and_port:
-            try:
-                host, port = testing_address_and_port.split(':')
-                accessible = self.test_connection(host, int(port), 2.0)
-            except Exception as e:
-                logging.error(f"Error checking service {service_name}: {e}")
+        key = (host, port)
         
-        # Update service status
-        self.service_status[service_name] = accessible
+        # Reuse a fresh cached result, including a recent failure
+        now = time.monotonic()
+        with self._dns_lock:
+            cached = self._dns_cache.get(key)
+        if cached is not None and cached[1] > now:
+            return cached[0]
         
-        # Update UI
-        self.update_service_ui(service_name, accessible, "Knock")
+        # IP literals never change, build their address directly and cache it for good
+        try:
+            ip = ipaddress.ip_address(host)
+        except ValueError:
+            pass
+        else:
+            if ip.version == 6:
+                info = [(socket.AF_INET6, socket.IPPROTO_TCP, (host, port, 0, 0))]
+            else:
+                info = [(socket.AF_INET, socket.IPPROTO_TCP, (host, port))]
+            with self._dns_lock:
+                self._dns_cache[key] = (info, float('inf'))
+            return info
         
-        logging.info(f"Service {service_name} is {'accessible' if accessible else 'not accessible'}")
-    
-    def resolve_address(self, host):
-        """Resolve hostname to IP address"""
+        # Resolve, remembering failures briefly so broken DNS isn't hammered
         try:
-            # Check if already an IP
-            try:
-                socket.inet_pton(socket.AF_INET, host)
-                return host  # It's an IPv4 address
-            except socket.error:
-                try:
-                    socket.inet_pton(socket.AF_INET6, host)
-                    return host  # It's an IPv6 address
-                except socket.error:
-                    pass  # Not an IP address, try to resolve
-            
-            # Resolve hostname
-            ip = socket.gethostbyname(host)
-            logging.info(f"Resolved {host} to {ip}")
-            return ip
-        except Exception as e:
-            logging.error(f"Error resolving address {host}: {e}")
-            return None
+            info = [(family, proto, sockaddr)
+                    for family, _, proto, _, sockaddr in socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)]
+            logging.info("Resolved %s to %s", host, ", ".join(sockaddr[0] for _, _, sockaddr in info))
+        except (socket.error, UnicodeError) as e:
+            logging.error("Error resolving address %s: %s", host, e)
+            info = None
+        
+        with self._dns_lock:
+            self._dns_cache[key] = (info, now + (self._dns_cache_ttl if info else self._dns_negative_ttl))
+        return info
     
-    def test_connection(self, host, port, timeout=1.0):
-        """Test if a connection can be established to host:port"""
+    def test_connection_once(self, host, port, family=socket.AF_UNSPEC, total_timeout=5.0, retry_window=0.0):
+        """Test if a connection can be established to host:port
+        
+        Each attempt tries the cached addresses of the host in turn (IPv4/IPv6
+        fallback), connecting straight to their socket addresses, and returns as
+        soon as a connection completes instead of at a fixed timeout.
+        
+        Args:
+            host: Hostname or IP address to connect to
+            port: TCP port to connect to
+            family: Address family of the host, AF_UNSPEC if not known
+            total_timeout: Time in seconds to wait for the connection
+            retry_window: Time in seconds of short attempts at the start, e.g. while a
+                firewall applies a knock and still drops or refuses the connection
+            
+        Returns:
+            True if the connection succeeded, False otherwise
+        """
         try:
             # Resolve hostname
-            ip = self.resolve_address(host)
-            if not ip:
+            info = self._resolve_cached(host, port, family)
+            if not info:
                 return False
             
-            # Create socket
-            address_family = socket.AF_INET6 if ':' in ip else socket.AF_INET
-            s = socket.socket(address_family, socket.SOCK_STREAM)
-            s.settimeout(timeout)
-            
             # Log the connection attempt
-            logging.info(f"Attempting connection to {ip}:{port} with timeout {timeout}s")
+            logging.info("Attempting connection to %s:%d with timeout %.1fs", host, port, total_timeout)
             
-            # Attempt connection
-            result = s.connect_ex((ip, port))
-            s.close()
+            start = time.monotonic()
+            deadline = start + total_timeout
+            retry_until = start + retry_window
+            while True:
+                # Inside the retry window a dropped SYN is retried with a fresh connection instead of
+                # waiting seconds for the OS to resend it, afterwards the rest of the budget is used
+                now = time.monotonic()
+                retrying = now < retry_until
+                attempt_timeout = deadline - now
+                if retrying:
+                    attempt_timeout = min(attempt_timeout, self._probe_attempt_timeout)
+                
+                # Try each cached address in turn, sharing what is left of the attempt between
+                # the untried ones, and connect straight to the sockaddr to keep its IPv6 scope
+                attempt_deadline = now + attempt_timeout
+                for i, (family, proto, sockaddr) in enumerate(info):
+                    with socket.socket(family, socket.SOCK_STREAM, proto) as s:
+                        s.settimeout(max((attempt_deadline - time.monotonic()) / (len(info) - i), 0.001))
+                        result = s.connect_ex(sockaddr)
+                        if result in (errno.EAGAIN, errno.EWOULDBLOCK):
+                            # connect_ex reports an expired timeout as a would-block error
+                            result = errno.ETIMEDOUT
+                        if result == 0:
+                            s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RESET)
+                            break
+                
+                if result == 0 or not retrying:
+                    break
+                # A refused or unreachable connection fails at once, pause a little before the next attempt
+                if result != errno.ETIMEDOUT:
+                    time.sleep(0.05)
             
             # Log the result
             if result == 0:
-                logging.info(f"Connection to {ip}:{port} successful")
+                logging.info("Connection to %s:%d successful", host, port)
             else:
-                logging.info(f"Connection to {ip}:{port} failed with error code {result}")
+                logging.info("Connection to %s:%d failed with error code %s", host, port, result)
             
+            # Always probed afresh since a knock may just have changed the result, but checks can reuse it
+            with self._probe_lock:
+                self._probe_cache[(host, port)] = (result == 0, time.monotonic() + self._probe_cache_ttl)
             return result == 0
             
         except Exception as e:
-            logging.error(f"Error testing connection to {host}:{port}: {e}")
+            logging.error("Error testing connection to %s:%s: %s", host, port, e)
             return False
     
     def start_auto_check_timer(self):
-        """Start a timer to periodically check services"""
-        # Cancel any existing timers
-        if hasattr(self, '_check_timer_id') and self._check_timer_id:
-            try:
-                self.root.after_cancel(self._check_timer_id)
-            except:
-                pass
-            
-        if hasattr(self, '_knock_timer_id') and self._knock_timer_id:
-            try:
-                self.root.after_cancel(self._knock_timer_id)
-            except:
-                pass
+        """Start periodic service checks and, if enabled, automatic knocking"""
+        # Stop the check and knock loops of the previous configuration
+        if self._check_stop is not None:
+            self._check_stop.set()
         
         # Get configuration values
         configurations = self.config.get("configurations", {})
@@ -1157,34 +1427,29 @@ class KnockThatDoorApp:
         auto_knock_enabled = configurations.get("auto_knock_enabled", False)
         auto_knock_interval_minutes = configurations.get("auto_knock_interval_minutes", 30)
         
-        # Convert to milliseconds for tkinter
-        check_interval = check_interval_minutes * 60 * 1000
-        auto_knock_interval = auto_knock_interval_minutes * 60 * 1000
+        # Services are checked and knocked from background threads, so the Tk loop
+        # is only woken up to show the results while the popup is visible
+        check_stop = threading.Event()
+        self._check_stop = check_stop
         
-        # Define the check function
-        def check_services():
-            if not self.is_shutting_down:
+        def check_loop():
+            while not check_stop.wait(check_interval_minutes * 60):
                 logging.info(f"Running scheduled service check (every {check_interval_minutes} minutes)")
-                self.check_all_services()
-                # Schedule next check
-                self._check_timer_id = self.root.after(check_interval, check_services)
+                self._check_batch()
         
-        # Define the knock function if enabled
-        def auto_knock():
-            if not self.is_shutting_down and auto_knock_enabled:
+        def knock_loop():
+            while not check_stop.wait(auto_knock_interval_minutes * 60):
                 logging.info(f"Running scheduled auto-knock (every {auto_knock_interval_minutes} minutes)")
                 # Perform knocking for all services
                 for service in self.config.get("services", []):
-                    threading.Thread(target=self.perform_knock, args=(service,), daemon=True).start()
-                # Schedule next knock
-                self._knock_timer_id = self.root.after(auto_knock_interval, auto_knock)
+                    self.pool.submit(self.perform_knock, service)
         
-        # Start timers
-        self._check_timer_id = self.root.after(check_interval, check_services)
+        # Start the loops
+        threading.Thread(target=check_loop, name="auto-check", daemon=True).start()
         logging.info(f"Automatic service checking scheduled every {check_interval_minutes} minutes")
         
         if auto_knock_enabled:
-            self._knock_timer_id = self.root.after(auto_knock_interval, auto_knock)
+            threading.Thread(target=knock_loop, name="auto-knock", daemon=True).start()
             logging.info(f"Automatic knocking scheduled every {auto_knock_interval_minutes} minutes")
 
 def main():
@@ -1203,6 +1468,9 @@ def main():
         except:
             pass
         
+        # Flush the queued log records, os._exit() doesn't give the listener a chance to
+        stop_logging()
+        
         # Exit without using sys.exit() to avoid issues
         os._exit(1)
 
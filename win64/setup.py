@@ -1,4 +1,3 @@
-from setuptools import setup
 import os
 import sys
 from cx_Freeze import setup, Executable
@@ -15,15 +14,13 @@ if os.path.exists(icon_path):
 else:
     print(f"WARNING: Icon not found at {icon_path}!")
 
-# Get all files in the img directory
+# Get all files in the img directory (scandir entries already carry their path and type)
 img_dir = os.path.join(base_dir, 'img')
 img_files = []
-if os.path.exists(img_dir):
-    for f in os.listdir(img_dir):
-        if not f.startswith('.'):
-            source = os.path.join(img_dir, f)
-            dest = os.path.join('img', f)
-            img_files.append((source, dest))
+if os.path.isdir(img_dir):
+    with os.scandir(img_dir) as it:
+        img_files = [(e.path, os.path.join('img', e.name)) for e in it
+                     if not e.name.startswith('.') and e.is_file()]
 
 # Include the configuration file
 additional_files = [